@@ -1,102 +1,408 @@
 from __future__ import annotations
-import streamlit as st, pandas as pd, plotly.express as px
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import os
+from functools import partial
+from typing import Callable, TypeVar
+import streamlit as st, numpy as np, pandas as pd, plotly.graph_objects as go
 from streamlit_autorefresh import st_autorefresh
 
+from study import bootstrap, charts, cube, export, paging, pipeline
+from study.filters import FilterIndex
+from study.lru import LRUCache
+from study.metrics import METRICS
+from study.pipeline import STAGES, Stage, StagePipeline
+from study.poller import Poller
+from study.sessions import Funnel
+from study.schema import DERIVED
+from study.source import StudySource, open_book
+from study.store import ArtifactStore, SnapshotStore
+
+T = TypeVar("T")
+
 st.set_page_config("Аналитика исследования", "📊", layout="wide")
-REQ_ANS, REFRESH_SEC = 40, 30
+REFRESH_SEC = 30
+SNAPSHOT_DIR = os.environ.get("STUDY_SNAPSHOT_DIR", ".snapshots")
+# каталог результатов study.worker; если задан, приложение ничего не считает само
+ARTIFACT_DIR = os.environ.get("STUDY_ARTIFACT_DIR")
+METRICS_LOG = os.environ.get("STUDY_METRICS_LOG")
+if METRICS_LOG:
+    METRICS.log_to(METRICS_LOG)
 st_autorefresh(interval=REFRESH_SEC * 1000, key="auto")
 
-tab1, tab2 = st.tabs(["Этап 1: 40 вопросов", "Этап 2: 15 вопросов"])
+tab1, tab2, tab3 = st.tabs(["Этап 1: 40 вопросов", "Этап 2: 15 вопросов", "Сессии и отказы"])
 
 
-def highlight_max(v, top="#2ECC71", base="#1f77b4"):
-    m = max(v) if len(v) else None
-    return [top if x == m else base for x in v]
+def _fields(source: StudySource, pipes: dict[str, StagePipeline]) -> dict:
+    return {
+        "version": source.version(),
+        **pipeline.fields({name: pipe.artifacts() for name, pipe in pipes.items()}),
+    }
 
 
-@st.cache_data(ttl=REFRESH_SEC, show_spinner="Обновляю данные…")
-def load_stage1() -> pd.DataFrame:
-    scopes = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(st.secrets["gsp"]), scopes)
-    raw = gspread.authorize(creds).open("human_study_results").sheet1.get_all_values()
-    base = [
-        "timestamp", "Пользователь", "qnum", "image_id", "Алгоритм", "Тип",
-        "Вопрос", "Ответ", "Правильный_ответ", "time_ms", "is_correct", "session_id"
-    ]
-    if not raw:
-        return pd.DataFrame(columns=base)
-    if raw[0][:3] == base[:3]:
-        raw = raw[1:]
-    df = pd.DataFrame(raw, columns=base[: len(max(raw, key=len))])
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df = df.dropna(subset=["timestamp"])
-    df["time_ms"] = pd.to_numeric(df["time_ms"], errors="coerce")
-    df["Время_сек"] = df["time_ms"] / 1000
-    df["is_correct"] = (
-        df["is_correct"].astype(str).str.strip().str.upper().isin(["TRUE", "1", "YES"])
+def _fetch(source: StudySource, pipes: dict[str, StagePipeline]) -> dict | None:
+    # версия не сдвинулась — ни разбора, ни пересчёта, снимок остаётся прежним;
+    # только конвейер, на котором прошлый опрос упал, пересчитывается по кадру
+    try:
+        changed = source.refresh()
+        pending = [(name, pipe) for name, pipe in pipes.items() if changed or pipe.stale]
+        if not pending:
+            return None
+        for name, pipe in pending:
+            pipe.update(source.sheets[name])
+    except Exception:
+        # водяной знак уже сдвинут, и дельты этого опроса больше не придут
+        for pipe in pipes.values():
+            pipe.stale = True
+        raise
+    return _fields(source, pipes)
+
+
+def _read(artifacts: ArtifactStore, seen: dict) -> dict | None:
+    # тонкий режим: всё посчитано воркером, здесь только чтение новой версии
+    versions = {name: artifacts.current(name) for name in STAGES}
+    if None in versions.values():
+        raise RuntimeError(f"в {ARTIFACT_DIR} нет результатов воркера")
+    version = ".".join(versions.values())
+    if version == seen.get("version"):
+        return None
+    frames = {name: artifacts.read(name, v) for name, v in versions.items()}
+    if None in frames.values():
+        raise RuntimeError(f"версия {version} прочитана не полностью")
+    seen["version"] = version
+    return {"version": version, **pipeline.fields(frames)}
+
+
+@st.cache_resource
+def _poller() -> Poller:
+    if ARTIFACT_DIR:
+        return Poller(partial(_read, ArtifactStore(ARTIFACT_DIR), {}), REFRESH_SEC).start()
+    source = StudySource(partial(open_book, dict(st.secrets["gsp"])), SnapshotStore(SNAPSHOT_DIR))
+    pipes = {name: StagePipeline(stage) for name, stage in STAGES.items()}
+    poller = Poller(partial(_fetch, source, pipes), REFRESH_SEC)
+    saved = source.restore()
+    if saved is not None:
+        for name, pipe in pipes.items():
+            pipe.reset(saved[name])
+        poller.seed(**_fields(source, pipes))
+    return poller.start()
+
+
+PAGE_SIZES = [50, 100, 500]
+BOOT_SIZES = [1000, 2000, 5000, 10000]
+FILTER_COLUMNS = {
+    "stage1": ["Пользователь", "Алгоритм", "Вопрос", "image_id"],
+    "stage2": ["user", "alg", "qtype", "group"],
+}
+
+
+@st.cache_resource(max_entries=4)
+def filter_index(version: str, name: str, _df: pd.DataFrame) -> FilterIndex:
+    with METRICS.span(f"filter_index.{name}", len(_df)):
+        return FilterIndex(_df, FILTER_COLUMNS[name])
+
+
+@st.cache_resource
+def _exports() -> LRUCache[bytes]:
+    return LRUCache(8, "exports")
+
+
+@st.cache_resource
+def _figures() -> LRUCache[go.Figure]:
+    return LRUCache(64, "figures")
+
+
+@st.cache_resource
+def _bootstraps() -> LRUCache[bootstrap.Bootstrap]:
+    return LRUCache(32, "bootstrap")
+
+
+@st.cache_resource
+def _orders() -> LRUCache[np.ndarray]:
+    return LRUCache(32, "orders")
+
+
+@st.cache_resource
+def _tables() -> LRUCache[object]:
+    return LRUCache(64, "tables")
+
+
+@st.cache_resource
+def _rows() -> LRUCache[pd.DataFrame]:
+    # отфильтрованные строки тяжелее сводных таблиц, поэтому их кэш короче
+    return LRUCache(4, "rows")
+
+
+def derived(key: tuple, build: Callable[[], T]) -> T:
+    # срезы куба и сводные таблицы считаются один раз на версию данных и фильтр;
+    # перезапуск без изменений берёт их из кэша, как show_chart — фигуры
+    return _tables().get(key, build)
+
+
+def show_chart(key: tuple, build: Callable[[], go.Figure]) -> None:
+    # фигура строится один раз на версию данных и фильтр, дальше берётся из кэша.
+    # В JSON её переводит сам st.plotly_chart на каждом перезапуске: готовую
+    # строку публичный API не принимает, поэтому этот шаг (render.*) остаётся
+    def timed() -> go.Figure:
+        with METRICS.span(f"figure.{key[0]}"):
+            return build()
+
+    fig = _figures().get(key, timed)
+    with METRICS.span(f"render.{key[0]}"):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def paged_table(
+    data: pd.DataFrame, key: str, height: int, data_key: tuple, sort_by: str | None = None
+) -> None:
+    # сортировка, поиск и нарезка на сервере: в браузер уходит только текущая страница.
+    # Порядок строк кэшируется по версии данных и фильтру (data_key): листание
+    # страниц его не пересчитывает
+    q, srt, desc, size = st.columns([3, 2, 1, 1])
+    text = q.text_input("Поиск", key=f"{key}_q")
+    cols = list(data.columns)
+    sort_by = srt.selectbox(
+        "Сортировка", cols, index=cols.index(sort_by) if sort_by in cols else 0, key=f"{key}_sort"
+    )
+    descending = desc.checkbox("По убыванию", key=f"{key}_desc")
+    page_size = size.selectbox("Строк", PAGE_SIZES, key=f"{key}_size")
+    def run() -> np.ndarray:
+        with METRICS.span(f"order.{key}", len(data)):
+            return paging.order(data, sort_by, descending, text)
+
+    pos = _orders().get((*data_key, key, sort_by, descending, text), run)
+    pages = max(1, -(-len(pos) // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = st.number_input("Страница", 1, pages, key=f"{key}_page")
+    lo = (page - 1) * page_size
+    view = data.iloc[pos[lo: lo + page_size]]
+    st.dataframe(view, use_container_width=True, height=height)
+    st.caption(f"Строки {min(lo + 1, len(pos))}–{lo + len(view)} из {len(pos):,}".replace(",", " "))
+
+
+def filter_key(filters: dict[str, list], d_from, d_to) -> tuple:
+    return tuple((c, tuple(sorted(v))) for c, v in filters.items()) + (d_from, d_to)
+
+
+def cube_cells(full: pd.DataFrame, name, df, filters, d_from, d_to) -> pd.DataFrame:
+    with METRICS.span(f"cube.{name}", len(full)) as span:
+        if cube.covers(full, filters):
+            cells = cube.restrict(full, filters, d_from, d_to)
+        else:
+            cells = cube.build(df, STAGES[name].dims)
+        span.rows_out = len(cells)
+    return cells
+
+
+def summary(cells: pd.DataFrame, by: str) -> pd.DataFrame:
+    with METRICS.span(f"rollup.{by}", len(cells)):
+        r = cube.rollup(cells, by)
+    return pd.DataFrame({
+        "Ответов": r["n"],
+        "Точность": (r["accuracy"] * 100).round(1),
+        "Ср_время": r["mean_t"].round(2),
+        "Затрудняюсь": r["dont"],
+    }).reset_index()
+
+
+def users_accuracy(cells: pd.DataFrame) -> pd.DataFrame:
+    r = cube.rollup(cells, "alg")
+    return pd.DataFrame({
+        "Пользователей": cells.groupby("alg", observed=True)["user"].nunique(),
+        "Точность": (r["accuracy"] * 100).round(1),
+    }).reset_index()
+
+
+def _interval(lo: pd.Series, hi: pd.Series, scale: float, digits: int) -> pd.Series:
+    return "[" + (lo * scale).round(digits).astype(str) + "; " + (hi * scale).round(digits).astype(str) + "]"
+
+
+def table_with_ci(
+    table: pd.DataFrame,
+    on: str,
+    key: tuple,
+    sums: Callable[[], pd.DataFrame],
+    user: str,
+    group: str,
+    n_boot: int,
+) -> None:
+    """Таблица по алгоритмам с 95% ДИ точности и времени и попарными сравнениями.
+
+    Бутстрэп считается один раз на версию данных, фильтр и число выборок;
+    суммы по пользователям (``sums``) собираются только при промахе кэша.
+    """
+    def run() -> bootstrap.Bootstrap:
+        data = sums()
+        with METRICS.span(f"bootstrap.{key[0]}", len(data)):
+            return bootstrap.bootstrap(data, user, group, n_boot=n_boot)
+
+    res = _bootstraps().get((*key, n_boot), run)
+    ci = res.ci.reset_index()
+    ci = pd.DataFrame({
+        on: ci[group],
+        "ДИ точности, %": _interval(ci["acc_lo"], ci["acc_hi"], 100, 1),
+        "ДИ времени, с": _interval(ci["t_lo"], ci["t_hi"], 1, 2),
+    })
+    keys = table[on].astype(str)
+    st.dataframe(
+        table.assign(**{c: keys.map(ci.set_index(on)[c]) for c in ci.columns if c != on}),
+        use_container_width=True,
+    )
+    with st.expander("Попарные сравнения (бутстрэп по пользователям)"):
+        p = res.pairs
+        st.dataframe(
+            pd.DataFrame({
+                "A": p["a"],
+                "B": p["b"],
+                "Δ точности, п.п.": (p["diff"] * 100).round(1),
+                "ДИ Δ, п.п.": _interval(p["lo"], p["hi"], 100, 1),
+                "p (точность)": p["p"].round(4),
+                "Δ времени, с": p["diff_t"].round(2),
+                "p (время)": p["p_t"].round(4),
+            }),
+            use_container_width=True,
+            hide_index=True,
+        )
+
+
+def status_counts(cells: pd.DataFrame) -> pd.DataFrame:
+    r = cube.rollup(cells, "alg")
+    return (
+        pd.DataFrame({"Правильных": r["correct"], "Ошибочных": r["n"] - r["correct"]})
+        .reset_index()
+        .melt(id_vars="alg", var_name="Статус", value_name="Количество")
     )
-    full = df.groupby("Пользователь")["qnum"].count().pipe(lambda s: s[s == REQ_ANS]).index
-    return df[df["Пользователь"].isin(full)]
-
-
-@st.cache_data(ttl=REFRESH_SEC, show_spinner="Загружаю данные второго этапа…")
-def load_stage2() -> pd.DataFrame:
-    scopes = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(st.secrets["gsp"]), scopes)
-    raw = (
-        gspread.authorize(creds)
-        .open("human_study_results")
-        .worksheet("stage2_log")
-        .get_all_records()
+
+
+debug = st.sidebar.checkbox("Панель производительности", key="perf_debug")
+n_boot = st.sidebar.select_slider("Бутстрэп: число выборок", BOOT_SIZES, value=2000, key="n_boot")
+debug_panel = st.sidebar.container()
+
+poller = _poller()
+with st.spinner("Обновляю данные…"):
+    snap = poller.latest(timeout=120)
+if snap is None:
+    st.error("Не удалось загрузить данные из Google Sheets.")
+    st.stop()
+if poller.error is not None:
+    # последний опрос упал: на экране прежний снимок, об этом надо сказать
+    st.warning(
+        f"Не удалось обновить данные ({type(poller.error).__name__}: {poller.error}). "
+        f"Показаны данные, загруженные в {snap.loaded_at:%H:%M:%S}."
+    )
+
+
+def funnel_section(fun: Funnel, stage: Stage) -> None:
+    ses = fun.sessions
+    done = int(ses["completed"].sum())
+    quit_ = int(ses["abandoned"].sum())
+    over = int((~ses["continued"] & (ses["user_answers"] > stage.required)).sum())
+    resumed = int(ses["continued"].sum())
+    a, b, c, d = st.columns(4)
+    a.metric("Сессий", f"{len(ses):,}".replace(",", " "))
+    b.metric("Завершено", f"{done:,}".replace(",", " "))
+    c.metric("Доля отказов", f"{quit_ / len(ses) * 100:.1f}%")
+    d.metric("Медианная длительность", f"{ses['duration_s'].median() / 60:.1f} мин")
+    if over or resumed:
+        st.caption(
+            "Как и в остальных вкладках, тест считается пройденным по пользователю: ответы всех "
+            "его сессий складываются, итог получает последняя сессия. "
+            f"Сессий, после которых пользователь вернулся: {resumed}; пользователей с ответами "
+            f"сверх {stage.required}: {over}. Ни те, ни другие не входят ни в завершённые, ни в отказы."
+        )
+
+    fkey = (snap.version, stage.name)
+    steps = fun.steps.rename(columns={
+        "reached": "Дошло", "dropped": "Бросили", "drop_rate": "Доля отказов",
+        "mean_dwell_s": "Ср_задержка", "median_dwell_s": "Мед_задержка",
+    })
+    show_chart(
+        ("funnel", *fkey),
+        lambda: charts.bar(
+            steps, x="qnum", y="Дошло", title="Воронка: сколько сессий дошло до вопроса",
+            labels={"qnum": "Номер вопроса", "Дошло": "Сессий"},
+        ),
+    )
+    show_chart(
+        ("dropped", *fkey),
+        lambda: charts.bar(
+            steps, x="qnum", y="Бросили", title="На каком вопросе сессия оборвалась",
+            labels={"qnum": "Номер вопроса", "Бросили": "Сессий"}, highlight="Бросили",
+        ),
+    )
+    show_chart(
+        ("dwell", *fkey),
+        lambda: charts.bar(
+            steps, x="qnum", y="Мед_задержка", title="Медианное время между ответами",
+            labels={"qnum": "Номер вопроса", "Мед_задержка": "Секунд"},
+        ),
     )
-    df = pd.DataFrame(raw)
-    if df.empty:
-        return df
-    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
-    df["time_ms"] = pd.to_numeric(df["time_ms"], errors="coerce")
-    df["Время_сек"] = df["time_ms"] / 1000
-    df["is_correct"] = (
-        df["is_correct"].astype(str).str.strip().str.upper().isin(["TRUE", "1", "YES"])
+
+    drop = fun.dropout.rename(columns={"shown": "Показов", "dropped": "Отказов", "drop_rate": "Доля отказов"})
+    st.subheader("Отказы по алгоритмам")
+    by_alg = drop.groupby(stage.alg, observed=True)[["Показов", "Отказов"]].sum()
+    by_alg["Доля отказов"] = (by_alg["Отказов"] / by_alg["Показов"] * 100).round(2)
+    st.dataframe(by_alg.reset_index(), use_container_width=True)
+    st.subheader("Отказы по изображениям")
+    drop["Доля отказов"] = (drop["Доля отказов"] * 100).round(2)
+    paged_table(drop, f"drop_{stage.name}", height=350, data_key=fkey, sort_by="Доля отказов")
+
+    st.subheader("Сессии")
+    paged_table(ses, f"ses_{stage.name}", height=400, data_key=fkey, sort_by="start")
+    sid = st.text_input("Хронология сессии: идентификатор", key=f"sid_{stage.name}")
+    if sid:
+        steps_of = fun.answers[fun.answers[stage.session] == sid]
+        if steps_of.empty:
+            st.info("Такой сессии нет.")
+        else:
+            st.dataframe(steps_of, use_container_width=True, hide_index=True)
+
+
+with tab3:
+    name = st.radio(
+        "Этап", list(STAGES), horizontal=True, key="funnel_stage",
+        format_func=lambda n: {"stage1": "Этап 1", "stage2": "Этап 2"}[n],
     )
-    return df
+    fun = snap.funnel1 if name == "stage1" else snap.funnel2
+    if fun is None or fun.sessions.empty:
+        st.info("Нет ответов для анализа сессий.")
+    else:
+        funnel_section(fun, STAGES[name])
 
 
 with tab1:
-    df_raw = load_stage1()
+    df_raw = snap.stage1
     if df_raw.empty:
         st.warning("Нет пользователей, прошедших тест полностью.")
         st.stop()
 
+    idx1 = filter_index(snap.version, "stage1", df_raw)
     st.sidebar.header("Фильтры")
-    users = st.sidebar.multiselect("Пользователь", sorted(df_raw["Пользователь"].unique()))
-    meth = st.sidebar.multiselect("Алгоритм", sorted(df_raw["Алгоритм"].unique()))
-    ques = st.sidebar.multiselect("Вопрос", sorted(df_raw["Вопрос"].unique()))
-    pics = st.sidebar.multiselect("Изображение", sorted(df_raw["image_id"].unique()))
-    dmin, dmax = df_raw["timestamp"].dt.date.agg(["min", "max"])
+    users = st.sidebar.multiselect("Пользователь", idx1.values("Пользователь"))
+    meth = st.sidebar.multiselect("Алгоритм", idx1.values("Алгоритм"))
+    ques = st.sidebar.multiselect("Вопрос", idx1.values("Вопрос"))
+    pics = st.sidebar.multiselect("Изображение", idx1.values("image_id"))
+    dmin, dmax = idx1.date_range()
     d_from = st.sidebar.date_input("Дата от", dmin)
     d_to = st.sidebar.date_input("Дата до", dmax)
 
-    mask = pd.Series(True, index=df_raw.index)
-    if users:
-        mask &= df_raw["Пользователь"].isin(users)
-    if meth:
-        mask &= df_raw["Алгоритм"].isin(meth)
-    if ques:
-        mask &= df_raw["Вопрос"].isin(ques)
-    if pics:
-        mask &= df_raw["image_id"].isin(pics)
-    mask &= (df_raw["timestamp"].dt.date >= d_from) & (
-        df_raw["timestamp"].dt.date <= d_to
-    )
-    df = df_raw[mask]
+    filt1 = {"Пользователь": users, "Алгоритм": meth, "Вопрос": ques, "image_id": pics}
+    key1 = (snap.version, filter_key(filt1, d_from, d_to))
 
-    tot = len(df)
-    corr = df["is_correct"].mean() * 100 if tot else 0
-    mean_t = df["Время_сек"].mean() if tot else 0
-    med_t = df["Время_сек"].median() if tot else 0
-    dont = df["Ответ"].astype(str).str.lower().str.startswith("затруд").sum()
+    def select1() -> pd.DataFrame:
+        with METRICS.span("filter.stage1", len(df_raw)) as span:
+            out = df_raw.iloc[idx1.select(filt1, d_from, d_to)]
+            span.rows_out = len(out)
+        return out
+
+    df = _rows().get(("stage1", *key1), select1)
+    cells1 = derived(("cells1", *key1), lambda: cube_cells(snap.cube1, "stage1", df, filt1, d_from, d_to))
+
+    sums, med_t = derived(("total1", *key1), lambda: (cube.total(cells1), df["Время_сек"].median()))
+    tot = int(sums["n"])
+    corr = sums["correct"] / tot * 100 if tot else 0
+    mean_t = sums["t_sum"] / sums["t_n"] if sums["t_n"] else 0
+    med_t = med_t if tot else 0
+    dont = int(sums["dont"])
     a, b, c, d, e = st.columns(5)
     a.metric("Всего ответов", f"{tot:,}".replace(",", " "))
     b.metric("Корректность", f"{corr:.1f}%")
@@ -105,185 +411,189 @@ with tab1:
     e.metric("«Затрудняюсь»", f"{dont:,}".replace(",", " "))
     st.divider()
 
-    q99 = df["Время_сек"].quantile(0.99)
-    st.plotly_chart(
-        px.histogram(
-            df.query("Время_сек<=@q99"),
-            x="Время_сек",
-            nbins=20,
+    show_chart(
+        ("hist", *key1),
+        lambda: charts.histogram(
+            df["Время_сек"].to_numpy(),
             title="Распределение времени ответа",
-            labels={"Время_сек": "Время, с", "count": "Количество"},
+            x_label="Время, с",
+            y_label="Количество",
         ),
-        use_container_width=True,
     )
 
     st.subheader("Пользователи")
-    perf = (
-        df.groupby("Пользователь")
-        .agg(
-            Ответов=("qnum", "count"),
-            Точность=("is_correct", "mean"),
-            Ср_время=("Время_сек", "mean"),
-            Затрудняюсь=(
-                "Ответ",
-                lambda s: (s.str.lower().str.startswith("затруд")).sum(),
-            ),
-        )
-        .reset_index()
-    )
-    perf["Точность"] = (perf["Точность"] * 100).round(1)
-    perf["Ср_время"] = perf["Ср_время"].round(2)
+    perf = derived(("perf", *key1), lambda: summary(cells1, "Пользователь"))
     st.dataframe(perf, use_container_width=True)
 
     st.subheader("Статистика по алгоритмам")
-    alg = (
-        df.groupby("Алгоритм")
-        .agg(
-            Ответов=("qnum", "count"),
-            Точность=("is_correct", "mean"),
-            Ср_время=("Время_сек", "mean"),
-            Затрудняюсь=(
-                "Ответ",
-                lambda s: (s.str.lower().str.startswith("затруд")).sum(),
-            ),
-        )
-        .reset_index()
+    alg = derived(("alg", *key1), lambda: summary(cells1, "Алгоритм"))
+    show_chart(
+        ("alg", *key1),
+        lambda: charts.bar(
+            alg,
+            x="Алгоритм",
+            y="Точность",
+            title="Точность ответов по алгоритмам",
+            labels={"Точность": "Точность, %"},
+            highlight="Точность",
+        ),
     )
-    alg["Точность"] = (alg["Точность"] * 100).round(1)
-    alg["Ср_время"] = alg["Ср_время"].round(2)
-    fig_alg = px.bar(
-        alg,
-        x="Алгоритм",
-        y="Точность",
-        title="Точность ответов по алгоритмам",
-        labels={"Точность": "Точность, %"},
+    show_chart(
+        ("dz", *key1),
+        lambda: charts.bar(
+            alg,
+            x="Алгоритм",
+            y="Затрудняюсь",
+            title="«Затрудняюсь» по алгоритмам",
+            labels={"Затрудняюсь": "Кол-во"},
+            highlight="Затрудняюсь",
+        ),
     )
-    fig_alg.update_traces(marker_color=highlight_max(alg["Точность"]))
-    st.plotly_chart(fig_alg, use_container_width=True)
-    fig_dz = px.bar(
-        alg,
-        x="Алгоритм",
-        y="Затрудняюсь",
-        title="«Затрудняюсь» по алгоритмам",
-        labels={"Затрудняюсь": "Кол-во"},
+    table_with_ci(
+        alg, "Алгоритм", ("alg", *key1),
+        lambda: bootstrap.cell_sums(cells1, "Пользователь", "Алгоритм"), "Пользователь", "Алгоритм", n_boot,
     )
-    fig_dz.update_traces(marker_color=highlight_max(alg["Затрудняюсь"]))
-    st.plotly_chart(fig_dz, use_container_width=True)
-    st.dataframe(alg, use_container_width=True)
 
     st.subheader("Статистика по изображениям")
-    pic = (
-        df.groupby("image_id")
-        .agg(
-            Ответов=("qnum", "count"),
-            Точность=("is_correct", "mean"),
-            Ср_время=("Время_сек", "mean"),
-            Затрудняюсь=(
-                "Ответ",
-                lambda s: (s.str.lower().str.startswith("затруд")).sum(),
-            ),
-        )
-        .reset_index()
-    )
-    pic["Точность"] = (pic["Точность"] * 100).round(1)
-    pic["Ср_время"] = pic["Ср_время"].round(2)
-    st.dataframe(pic, use_container_width=True, height=350)
+    pic = derived(("pic", *key1), lambda: summary(cells1, "image_id"))
+    paged_table(pic, "pic", height=350, data_key=key1)
 
     st.subheader("Буквенные вопросы: средняя точность первого показа по алгоритмам")
-    letters1 = df[df["Тип"] == "letters"]
-    if not letters1.empty:
-        first1 = (
-            letters1.sort_values("timestamp")
-            .groupby(["Пользователь", "image_id"], as_index=False)
-            .first()
-        )
-        stat1 = (
-            first1.groupby("Алгоритм")
+    def first_exposures() -> tuple[pd.DataFrame, pd.DataFrame]:
+        if meth or ques or (d_from, d_to) != (dmin, dmax):
+            # фильтр может отсечь сам первый показ — тогда первым считается следующий
+            with METRICS.span("first_exposure.filtered", len(df)):
+                first = (
+                    df[df["Тип"] == "letters"]
+                    .sort_values("timestamp", kind="stable")
+                    .drop_duplicates(["Пользователь", "image_id"])
+                )
+        else:
+            first = df[df.index.isin(snap.first1)]
+        if first.empty:
+            return first, pd.DataFrame()
+        stat = (
+            first.groupby("Алгоритм", observed=True)
             .agg(Пользователей=("Пользователь", "count"), Точность=("is_correct", "mean"))
             .reset_index()
         )
-        stat1["Точность"] = (stat1["Точность"] * 100).round(1)
-        fig_letters1 = px.bar(
-            stat1,
-            x="Алгоритм",
-            y="Точность",
-            text="Пользователей",
-            title="Средняя точность (Этап 1)",
-            labels={"Точность": "Точность, %", "Пользователей": "Пользователей"},
+        stat["Точность"] = (stat["Точность"] * 100).round(1)
+        return first, stat
+
+    first1, stat1 = derived(("first1", *key1), first_exposures)
+    if not first1.empty:
+        show_chart(
+            ("letters1", *key1),
+            lambda: charts.bar(
+                stat1,
+                x="Алгоритм",
+                y="Точность",
+                text="Пользователей",
+                title="Средняя точность (Этап 1)",
+                labels={"Точность": "Точность, %", "Пользователей": "Пользователей"},
+                highlight="Точность",
+            ),
+        )
+        table_with_ci(
+            stat1, "Алгоритм", ("letters1", *key1),
+            lambda: bootstrap.user_sums(first1, "Пользователь", "Алгоритм"), "Пользователь", "Алгоритм", n_boot,
         )
-        fig_letters1.update_traces(marker_color=highlight_max(stat1["Точность"]))
-        st.plotly_chart(fig_letters1, use_container_width=True)
-        st.dataframe(stat1, use_container_width=True)
     else:
-        stat1 = pd.DataFrame()
         st.info("В данных нет вопросов типа «буквы» для этапа 1.")
 
-    df2_all = load_stage2()
-    full2 = df2_all.groupby("user")["qnum"].count()
-    df2 = df2_all[df2_all["user"].isin(full2[full2 == 15].index)]
-    letters2 = df2[df2["qtype"] == "letters"]
-    stat2 = (
-    letters2.groupby("alg")
-            .agg(Пользователей=("user", "nunique"),
-                 Точность=("is_correct", "mean"))
-            .reset_index()
-)
-    stat2["Точность"] = (stat2["Точность"] * 100).round(1)
+    def letters_all() -> tuple[pd.DataFrame | None, pd.DataFrame]:
+        if snap.cube2 is None:
+            return None, pd.DataFrame()
+        letters = snap.cube2[snap.cube2["qtype"] == "letters"]
+        return letters, users_accuracy(letters)
+
+    letters2, stat2 = derived(("letters2_all", snap.version), letters_all)
 
     if not stat1.empty and not stat2.empty:
-        cmp = (
-            pd.merge(
-                stat1[["Алгоритм", "Точность"]],
-                stat2.rename(columns={"alg": "Алгоритм"})[["Алгоритм", "Точность"]],
-                on="Алгоритм",
-                how="outer",
-                suffixes=("_1", "_2"),
+        def compare() -> go.Figure:
+            cmp = (
+                pd.merge(
+                    stat1[["Алгоритм", "Точность"]],
+                    stat2.rename(columns={"alg": "Алгоритм"})[["Алгоритм", "Точность"]],
+                    on="Алгоритм",
+                    how="outer",
+                    suffixes=("_1", "_2"),
+                )
+                .fillna(0)
             )
-            .fillna(0)
-        )
-        melt = cmp.melt(id_vars="Алгоритм", var_name="Этап", value_name="Точность")
-        melt["Этап"] = melt["Этап"].map({"Точность_1": "Этап 1", "Точность_2": "Этап 2"})
-        fig_cmp = px.bar(
-            melt,
-            x="Алгоритм",
-            y="Точность",
-            color="Этап",
-            barmode="group",
-            text="Точность",
-            title="Буквенные вопросы: сравнение точности (Этап 1 vs Этап 2)",
-            labels={"Алгоритм": "Алгоритм", "Точность": "Точность, %"},
-        )
-        st.plotly_chart(fig_cmp, use_container_width=True)
-
-        comb_letters = pd.concat(
-            [
-                first1.rename(columns={"Алгоритм": "alg"})[["alg", "is_correct"]],
-                letters2[["alg", "is_correct"]],
-            ],
-            ignore_index=True,
-        ).rename(columns={"alg": "Алгоритм"})
-        comb_stat = (
-            comb_letters.groupby("Алгоритм")
-            .agg(Экспозиций=("is_correct", "count"), Точность=("is_correct", "mean"))
-            .reset_index()
-        )
-        comb_stat["Точность"] = (comb_stat["Точность"] * 100).round(1)
+            melt = cmp.melt(id_vars="Алгоритм", var_name="Этап", value_name="Точность")
+            melt["Этап"] = melt["Этап"].map({"Точность_1": "Этап 1", "Точность_2": "Этап 2"})
+            return charts.bar(
+                melt,
+                x="Алгоритм",
+                y="Точность",
+                color="Этап",
+                barmode="group",
+                text="Точность",
+                title="Буквенные вопросы: сравнение точности (Этап 1 vs Этап 2)",
+                labels={"Алгоритм": "Алгоритм", "Точность": "Точность, %"},
+            )
+
+        show_chart(("cmp", *key1), compare)
+
+        def combined() -> pd.DataFrame:
+            comb = (
+                first1.groupby("Алгоритм", observed=True)["is_correct"]
+                .agg(n="count", correct="sum")
+                .pipe(lambda s: s.set_axis(s.index.astype(str)))
+                .add(
+                    cube.rollup(letters2, "alg")[["n", "correct"]]
+                    .pipe(lambda s: s.set_axis(s.index.astype(str))),
+                    fill_value=0,
+                )
+            )
+            return pd.DataFrame({
+                "Экспозиций": comb["n"].astype("int64"),
+                "Точность": (comb["correct"] / comb["n"] * 100).round(1),
+            }).rename_axis("Алгоритм").reset_index()
+
+        comb_stat = derived(("tot", *key1), combined)
         st.subheader("Буквенные вопросы: суммарная точность двух этапов")
-        fig_tot = px.bar(
-            comb_stat,
-            x="Алгоритм",
-            y="Точность",
-            text="Экспозиций",
-            title="Суммарная точность (Этап 1 + Этап 2)",
-            labels={"Точность": "Точность, %", "Экспозиций": "Экспозиций"},
+        show_chart(
+            ("tot", *key1),
+            lambda: charts.bar(
+                comb_stat,
+                x="Алгоритм",
+                y="Точность",
+                text="Экспозиций",
+                title="Суммарная точность (Этап 1 + Этап 2)",
+                labels={"Точность": "Точность, %", "Экспозиций": "Экспозиций"},
+                highlight="Точность",
+            ),
         )
-        fig_tot.update_traces(marker_color=highlight_max(comb_stat["Точность"]))
-        st.plotly_chart(fig_tot, use_container_width=True)
-        st.dataframe(comb_stat, use_container_width=True)
+        def comb_sums() -> pd.DataFrame:
+            # пользователи двух этапов — разные кластеры, даже если имена совпали
+            out = pd.concat([
+                bootstrap.user_sums(first1, "Пользователь", "Алгоритм")
+                .rename(columns={"Пользователь": "user", "Алгоритм": "alg"})
+                .assign(user=lambda d: "1:" + d["user"].astype(str)),
+                bootstrap.cell_sums(letters2, "user", "alg")
+                .assign(user=lambda d: "2:" + d["user"].astype(str)),
+            ])
+            out["alg"] = out["alg"].astype(str)
+            return out
+
+        table_with_ci(comb_stat, "Алгоритм", ("tot", *key1), comb_sums, "user", "alg", n_boot)
 
-    csv = df.to_csv(index=False).encode("utf-8-sig")
     st.subheader("Данные")
-    st.download_button("💾 Скачать CSV", csv, "human_study_results.csv", "text/csv")
+    fmt = st.radio(
+        "Формат выгрузки", list(export.FORMATS), horizontal=True,
+        format_func=lambda f: export.FORMATS[f][0],
+    )
+    exp_key = (*key1, fmt)
+    if exp_key in _exports() or st.button("Подготовить файл"):
+        def build_export() -> bytes:
+            with METRICS.span(f"export.{fmt}", len(df)):
+                return export.build(df.drop(columns=DERIVED), fmt)
+
+        data = _exports().get(exp_key, build_export)
+        _, mime, ext = export.FORMATS[fmt]
+        st.download_button("💾 Скачать", data, f"human_study_results{ext}", mime)
     cols = [
         "timestamp",
         "Пользователь",
@@ -298,44 +608,46 @@ with tab1:
         "is_correct",
         "session_id",
     ]
-    st.dataframe(df[[c for c in cols if c in df.columns]], use_container_width=True, height=500)
+    paged_table(
+        df[[c for c in cols if c in df.columns]], "raw", height=500, data_key=key1, sort_by="timestamp"
+    )
     st.caption(f"Данные обновляются каждые {REFRESH_SEC} секунд")
 
 with tab2:
-    df2_all = load_stage2()
-    if df2_all.empty:
+    df2 = snap.stage2
+    if df2.empty:
         st.warning("Нет данных второго этапа.")
         st.stop()
 
-    full2 = df2_all.groupby("user")["qnum"].count()
-    df2 = df2_all[df2_all["user"].isin(full2[full2 == 15].index)]
-
+    idx2 = filter_index(snap.version, "stage2", df2)
     st.sidebar.header("Фильтры (этап 2)")
-    users2 = st.sidebar.multiselect("Пользователь (этап 2)", sorted(df2["user"].unique()), key="u2")
-    meth2 = st.sidebar.multiselect("Алгоритм (этап 2)", sorted(df2["alg"].unique()), key="m2")
-    ques2 = st.sidebar.multiselect("Тип вопроса (этап 2)", sorted(df2["qtype"].unique()), key="q2")
-    pics2 = st.sidebar.multiselect("Изображение (этап 2)", sorted(df2["group"].unique()), key="p2")
-    dmin2, dmax2 = df2["timestamp"].dt.date.agg(["min", "max"])
+    users2 = st.sidebar.multiselect("Пользователь (этап 2)", idx2.values("user"), key="u2")
+    meth2 = st.sidebar.multiselect("Алгоритм (этап 2)", idx2.values("alg"), key="m2")
+    ques2 = st.sidebar.multiselect("Тип вопроса (этап 2)", idx2.values("qtype"), key="q2")
+    pics2 = st.sidebar.multiselect("Изображение (этап 2)", idx2.values("group"), key="p2")
+    dmin2, dmax2 = idx2.date_range()
     d_from2 = st.sidebar.date_input("Дата от (этап 2)", dmin2, key="d2_from")
     d_to2 = st.sidebar.date_input("Дата до (этап 2)", dmax2, key="d2_to")
 
-    mask2 = pd.Series(True, index=df2.index)
-    if users2:
-        mask2 &= df2["user"].isin(users2)
-    if meth2:
-        mask2 &= df2["alg"].isin(meth2)
-    if ques2:
-        mask2 &= df2["qtype"].isin(ques2)
-    if pics2:
-        mask2 &= df2["group"].isin(pics2)
-    mask2 &= (df2["timestamp"].dt.date >= d_from2) & (df2["timestamp"].dt.date <= d_to2)
-    df2 = df2[mask2]
-
-    tot2 = len(df2)
-    corr2 = df2["is_correct"].mean() * 100 if tot2 else 0
-    mean2 = df2["Время_сек"].mean() if tot2 else 0
-    med2 = df2["Время_сек"].median() if tot2 else 0
-    dont2 = df2["answer"].astype(str).str.lower().str.startswith("затруд").sum()
+    filt2 = {"user": users2, "alg": meth2, "qtype": ques2, "group": pics2}
+    key2 = (snap.version, filter_key(filt2, d_from2, d_to2))
+    raw2 = df2
+
+    def select2() -> pd.DataFrame:
+        with METRICS.span("filter.stage2", len(raw2)) as span:
+            out = raw2.iloc[idx2.select(filt2, d_from2, d_to2)]
+            span.rows_out = len(out)
+        return out
+
+    df2 = _rows().get(("stage2", *key2), select2)
+    cells2 = derived(("cells2", *key2), lambda: cube_cells(snap.cube2, "stage2", df2, filt2, d_from2, d_to2))
+
+    sums2, med2 = derived(("total2", *key2), lambda: (cube.total(cells2), df2["Время_сек"].median()))
+    tot2 = int(sums2["n"])
+    corr2 = sums2["correct"] / tot2 * 100 if tot2 else 0
+    mean2 = sums2["t_sum"] / sums2["t_n"] if sums2["t_n"] else 0
+    med2 = med2 if tot2 else 0
+    dont2 = int(sums2["dont"])
     a, b, c, d, e = st.columns(5)
     a.metric("Всего ответов", f"{tot2:,}".replace(",", " "))
     b.metric("Корректность", f"{corr2:.1f}%")
@@ -344,139 +656,102 @@ with tab2:
     e.metric("«Затрудняюсь»", f"{dont2:,}".replace(",", " "))
     st.divider()
 
-    letters2 = df2[df2["qtype"] == "letters"]
-    stat_l2 = (
-        letters2.groupby("alg")
-        .agg(Пользователей=("user", "nunique"), Точность=("is_correct", "mean"))
-        .reset_index()
-    )
-    stat_l2["Точность"] = (stat_l2["Точность"] * 100).round(1)
+    def letters_tables() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+        letters = cells2[cells2["qtype"] == "letters"]
+        return letters, users_accuracy(letters), status_counts(letters)
+
+    letters2, stat_l2, letters_counts = derived(("letters2", *key2), letters_tables)
     st.subheader("Буквенные вопросы: второй этап")
-    fig_l2 = px.bar(
-        stat_l2,
-        x="alg",
-        y="Точность",
-        text="Пользователей",
-        title="Точность ответов на буквенные вопросы",
-        labels={"alg": "Алгоритм", "Точность": "Точность, %", "Пользователей": "Уникальных пользователей"},
+    show_chart(
+        ("l2", *key2),
+        lambda: charts.bar(
+            stat_l2,
+            x="alg",
+            y="Точность",
+            text="Пользователей",
+            title="Точность ответов на буквенные вопросы",
+            labels={"alg": "Алгоритм", "Точность": "Точность, %", "Пользователей": "Уникальных пользователей"},
+            highlight="Точность",
+        ),
     )
-    fig_l2.update_traces(marker_color=highlight_max(stat_l2["Точность"]))
-    st.plotly_chart(fig_l2, use_container_width=True)
-    st.dataframe(stat_l2, use_container_width=True)
-    letters_counts = (
-    letters2.groupby("alg")
-            .agg(
-                Правильных=("is_correct", "sum"),
-                Ошибочных=("is_correct", lambda s: (~s).sum())
-            )
-            .reset_index()
-            .melt(id_vars="alg", var_name="Статус", value_name="Количество")
-)    
-    fig_l2_cnt = px.bar(
-    letters_counts,
-    x="alg",
-    y="Количество",
-    color="Статус",
-    barmode="group",
-    text="Количество",
-    title="Буквенные вопросы: количество правильных и ошибочных ответов",
-    labels={"alg": "Алгоритм"},
-)
-    fig_l2_cnt.update_layout(legend_title_text="")
-    st.plotly_chart(fig_l2_cnt, use_container_width=True)
-
-    df_c2 = df2[df2["qtype"] == "corners"]
-    df_c2 = df_c2[df_c2["alg"].isin(["socolov_lab_result", "socolov_rgb_result"])]
-    stat_c2 = (
-        df_c2.groupby("alg")
-        .agg(Ответов=("user", "count"), Точность=("is_correct", "mean"))
-        .reset_index()
+    table_with_ci(
+        stat_l2, "alg", ("l2", *key2), lambda: bootstrap.cell_sums(letters2, "user", "alg"), "user", "alg", n_boot,
+    )
+    show_chart(
+        ("l2_cnt", *key2),
+        lambda: charts.bar(
+            letters_counts,
+            x="alg",
+            y="Количество",
+            color="Статус",
+            barmode="group",
+            text="Количество",
+            title="Буквенные вопросы: количество правильных и ошибочных ответов",
+            labels={"alg": "Алгоритм"},
+            legend_title="",
+        ),
     )
-    stat_c2["Точность"] = (stat_c2["Точность"] * 100).round(1)
+
+    def corner_tables() -> tuple[pd.DataFrame, ...]:
+        corners = cells2[cells2["qtype"] == "corners"]
+        pair = corners[corners["alg"].isin(["socolov_lab_result", "socolov_rgb_result"])]
+        r = cube.rollup(pair, "alg")
+        stat = pd.DataFrame({
+            "Ответов": r["n"],
+            "Точность": (r["accuracy"] * 100).round(1),
+        }).reset_index()
+        r_all = cube.rollup(corners, "alg")          # все алгоритмы, не только два выше
+        details = pd.DataFrame({
+            "Всего": r_all["n"],
+            "Правильных": r_all["correct"],
+            "Ошибочных": r_all["n"] - r_all["correct"],
+            "Ошибка_Нет": r_all["err_no"],
+            "Ошибка_Да": r_all["err_yes"],
+            "Ошибка_Затрудняюсь": r_all["err_dont"],
+            "Точность": (r_all["accuracy"] * 100).round(1),
+        })
+        return pair, stat, status_counts(pair), details
+
+    df_c2, stat_c2, corn_counts, details_c2 = derived(("corners2", *key2), corner_tables)
     st.subheader("Вопросы про углы: второй этап")
-    fig_c2 = px.bar(
-        stat_c2,
-        x="alg",
-        y="Точность",
-        text="Ответов",
-        title="Точность ответов по угловым вопросам",
-        labels={"alg": "Алгоритм", "Точность": "Точность, %", "Ответов": "Количество ответов"},
+    show_chart(
+        ("c2", *key2),
+        lambda: charts.bar(
+            stat_c2,
+            x="alg",
+            y="Точность",
+            text="Ответов",
+            title="Точность ответов по угловым вопросам",
+            labels={"alg": "Алгоритм", "Точность": "Точность, %", "Ответов": "Количество ответов"},
+            highlight="Точность",
+        ),
+    )
+    table_with_ci(
+        stat_c2, "alg", ("c2", *key2), lambda: bootstrap.cell_sums(df_c2, "user", "alg"), "user", "alg", n_boot,
+    )
+    show_chart(
+        ("c2_cnt", *key2),
+        lambda: charts.bar(
+            corn_counts,
+            x="alg",
+            y="Количество",
+            color="Статус",
+            barmode="group",
+            text="Количество",
+            title="Угловые вопросы: количество правильных и ошибочных ответов",
+            labels={"alg": "Алгоритм"},
+            legend_title="",
+        ),
     )
-    fig_c2.update_traces(marker_color=highlight_max(stat_c2["Точность"]))
-    st.plotly_chart(fig_c2, use_container_width=True)
-    st.dataframe(stat_c2, use_container_width=True)
-    corn_counts = (
-    df_c2.groupby("alg")
-         .agg(
-             Правильных=("is_correct", "sum"),
-             Ошибочных=("is_correct", lambda s: (~s).sum())
-         )
-         .reset_index()
-         .melt(id_vars="alg", var_name="Статус", value_name="Количество")
-)
-    fig_c2_cnt = px.bar(
-    corn_counts,
-    x="alg",
-    y="Количество",
-    color="Статус",
-    barmode="group",              
-    text="Количество",
-    title="Угловые вопросы: количество правильных и ошибочных ответов",
-    labels={"alg": "Алгоритм"},
-)
-    fig_c2_cnt.update_layout(legend_title_text="")
-    st.plotly_chart(fig_c2_cnt, use_container_width=True)
-    df_c2 = df2[df2["qtype"] == "corners"].copy()          # тот же срез, что выше
-
-    df_c2["inc_zat"] = (
-    (~df_c2["is_correct"]) &
-    df_c2["answer"].astype(str).str.lower().str.startswith("затруд")
-)
-    df_c2["inc_no"] = (
-    (~df_c2["is_correct"]) &
-    (df_c2["answer"].astype(str).str.lower().str.strip() == "нет")
-)
-    df_c2["inc_yes"] = (
-    (~df_c2["is_correct"]) &
-    (df_c2["answer"].astype(str).str.lower().str.strip().isin(["да", "yes", "y"]))
-)
-    details_c2 = (
-    df_c2.groupby("alg")
-         .agg(
-             Всего            = ("qnum",       "count"),
-             Правильных       = ("is_correct", "sum"),
-             Ошибочных        = ("is_correct", lambda s: (~s).sum()),
-             Ошибка_Нет       = ("inc_no",     "sum"),
-             Ошибка_Да        = ("inc_yes",    "sum"),
-             Ошибка_Затрудняюсь = ("inc_zat",  "sum"),
-         )
-         .assign(
-             Точность = lambda x: (x["Правильных"] / x["Всего"] * 100).round(1)
-         )
-         [["Всего","Правильных","Ошибочных",
-           "Ошибка_Нет","Ошибка_Да","Ошибка_Затрудняюсь","Точность"]]
-)
     st.subheader("Угловые вопросы: подробная статистика ошибок")
     st.dataframe(details_c2, use_container_width=True)
     
     st.subheader("Статистика по изображениям")
-    pic2 = (
-        df2.groupby("group")
-        .agg(
-            Ответов=("qnum", "count"),
-            Точность=("is_correct", "mean"),
-            Ср_время=("Время_сек", "mean"),
-            Затрудняюсь=(
-                "answer",
-                lambda s: s.astype(str).str.lower().str.startswith("затруд").sum(),
-            ),
-        )
-        .reset_index()
-        .rename(columns={"group": "Изображение"})
-    )
-    if not pic2.empty:
-        pic2["Точность"] = (pic2["Точность"] * 100).round(1)
-        pic2["Ср_время"] = pic2["Ср_время"].round(2)
-    st.dataframe(pic2, use_container_width=True, height=350)
-
-
+    pic2 = derived(("pic2", *key2), lambda: summary(cells2, "group").rename(columns={"group": "Изображение"}))
+    paged_table(pic2, "pic2", height=350, data_key=key2)
+
+if debug:
+    with debug_panel:
+        st.caption(f"Версия данных: {snap.version}, загружено {snap.loaded_at:%H:%M:%S}")
+        st.dataframe(METRICS.summary(), use_container_width=True, hide_index=True)
+        st.dataframe(METRICS.hit_rates(), use_container_width=True, hide_index=True)
@@ -0,0 +1,157 @@
+"""Бенчмарк конвейера дашборда на синтетических данных.
+
+Запуск: ``python -m study.bench --users 100 1000 10000 --repeat 7``.
+Для каждого объёма печатаются перцентили задержки каждого этапа и пиковая
+память (по ``tracemalloc``, отдельным прогоном, чтобы трассировка не
+искажала время).
+"""
+from __future__ import annotations
+import argparse
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from study import charts, cube, export
+from study.completion import CompletionTracker
+from study.exposure import FirstExposure
+from study.filters import FilterIndex
+from study.sessions import analyze
+from study.source import StudySource
+from study.synth import stage1_rows, study_book
+
+FILTER_COLUMNS = ["Пользователь", "Алгоритм", "Вопрос", "image_id"]
+
+
+@dataclass
+class Result:
+    users: int
+    rows: int
+    scenario: str
+    times: np.ndarray
+    peak: int
+
+    def line(self) -> str:
+        p50, p90, p99 = np.percentile(self.times, [50, 90, 99]) * 1000
+        return (
+            f"{self.users:>8} {self.rows:>9} {self.scenario:<16} "
+            f"{p50:>9.1f} {p90:>9.1f} {p99:>9.1f} {self.times.max() * 1000:>9.1f} "
+            f"{self.peak / 2**20:>9.1f}"
+        )
+
+
+HEADER = (
+    f"{'users':>8} {'rows':>9} {'scenario':<16} "
+    f"{'p50_ms':>9} {'p90_ms':>9} {'p99_ms':>9} {'max_ms':>9} {'peak_mb':>9}"
+)
+
+
+def measure(fn: Callable[[], object], repeat: int) -> tuple[np.ndarray, int]:
+    fn()
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return np.array(times), peak
+
+
+def scenarios(users: int, seed: int = 0, shards: int = 1) -> tuple[int, dict[str, Callable[[], object]]]:
+    book = study_book(users, seed=seed, shards=shards)
+    source = StudySource(lambda: book)
+    source.refresh()
+    # хвост дописывается в активный (последний) шард первого этапа
+    active = source.sheets["stage1"].parts[-1].ws
+    raw1 = source.sheets["stage1"].frame
+    raw2 = source.sheets["stage2"].frame
+
+    done1 = CompletionTracker("Пользователь", 40, cube.STAGE1_DIMS)
+    done1.reset(raw1)
+    done2 = CompletionTracker("user", 15, cube.STAGE2_DIMS)
+    done2.reset(raw2)
+    df1, cube1 = done1.frame, done1.cube
+    index = FilterIndex(df1, FILTER_COLUMNS)
+    d_from, d_to = index.date_range()
+    algs = index.values("Алгоритм")[:2]
+    perf = cube.rollup(cube1, "Алгоритм").reset_index()
+
+    def cold_load():
+        StudySource(lambda: book).refresh()
+
+    def tail_load():
+        # новый пользователь дописывает полный тест: только дочитывание и разбор хвоста
+        name = f"bench{len(active.rows)}"
+        tail = stage1_rows(1, seed=len(active.rows), dropout=0)[1:]
+        active.append_rows([[r[0], name, *r[2:]] for r in tail])
+        source.refresh()
+
+    def aggregate():
+        for by in ("Пользователь", "Алгоритм", "image_id", "Тип", ["Алгоритм", "Тип"]):
+            cube.rollup(cube1, by)
+        for by in ("alg", "qtype", "group", ["alg", "group"]):
+            cube.rollup(done2.cube, by)
+        cube.total(cube.restrict(cube1, {"Алгоритм": algs}, d_from, d_to))
+
+    def figures():
+        charts.bar(perf, x="Алгоритм", y="n", highlight="n").to_json()
+        charts.histogram(df1["Время_сек"], title="Время ответа").to_json()
+
+    return len(raw1), {
+        "load_cold": cold_load,
+        "load_tail": tail_load,
+        "load_unchanged": source.refresh,
+        "completion": lambda: (done1.reset(raw1), done2.reset(raw2)),
+        "filter_index": lambda: FilterIndex(df1, FILTER_COLUMNS),
+        "filter_select": lambda: df1.iloc[index.select({"Алгоритм": algs}, d_from, d_to)],
+        "cube_build": lambda: cube.build(df1, cube.STAGE1_DIMS),
+        "aggregate": aggregate,
+        "sessions": lambda: analyze(raw1, "session_id", "Пользователь", "Алгоритм", "image_id", 40),
+        "first_exposure": lambda: FirstExposure(["Пользователь", "image_id"], "Тип", "letters").reset(df1),
+        "figures": figures,
+        "export_csv": lambda: export.build(df1, "csv"),
+        "export_parquet": lambda: export.build(df1, "parquet"),
+    }
+
+
+def run(users: list[int], repeat: int, only: list[str] | None = None, shards: int = 1) -> list[Result]:
+    results = []
+    for n in users:
+        rows, cases = scenarios(n, shards=shards)
+        for name, fn in cases.items():
+            if only and name not in only:
+                continue
+            times, peak = measure(fn, repeat)
+            results.append(Result(n, rows, name, times, peak))
+            print(results[-1].line(), flush=True)
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--users", type=int, nargs="+", default=[100, 1000])
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", nargs="*", help="имена сценариев")
+    ap.add_argument("--shards", type=int, default=1, help="число листов-шардов первого этапа")
+    ap.add_argument("--out", help="дописать таблицу в файл")
+    args = ap.parse_args(argv)
+    print(HEADER, flush=True)
+    results = run(args.users, args.repeat, args.only, args.shards)
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(f"# {pd.Timestamp.now():%Y-%m-%d %H:%M:%S} repeat={args.repeat} shards={args.shards}\n{HEADER}\n")
+            f.writelines(r.line() + "\n" for r in results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+SUMS = ["n", "correct", "t_n", "t_sum"]
+CI_COLUMNS = ["users", "accuracy", "acc_lo", "acc_hi", "mean_t", "t_lo", "t_hi"]
+PAIR_COLUMNS = ["a", "b", "diff", "lo", "hi", "p", "diff_t", "p_t"]
+
+
+@dataclass(frozen=True)
+class Bootstrap:
+    ci: pd.DataFrame      # по группе: точность, среднее время и их границы
+    pairs: pd.DataFrame   # по паре групп: разница, её границы и p-значение
+
+
+def user_sums(df: pd.DataFrame, user: str, group: str, time: str = "Время_сек") -> pd.DataFrame:
+    """Суммы по паре (пользователь, группа) из строк ответов."""
+    t = df[time]
+    return (
+        df[[user, group]]
+        .assign(n=1, correct=df["is_correct"].astype("int64"), t_n=t.notna().astype("int64"), t_sum=t.fillna(0))
+        .groupby([user, group], observed=True)[SUMS]
+        .sum()
+        .reset_index()
+    )
+
+
+def cell_sums(cells: pd.DataFrame, user: str, group: str) -> pd.DataFrame:
+    """То же из ячеек куба: измерения куба аддитивны, строки не нужны."""
+    return cells.groupby([user, group], observed=True)[SUMS].sum().reset_index()
+
+
+def _quantiles(x: np.ndarray, level: float) -> tuple[np.ndarray, np.ndarray]:
+    a = (1 - level) / 2
+    lo, hi = np.nanquantile(x, [a, 1 - a], axis=0)
+    return lo, hi
+
+
+def _p_value(d: np.ndarray) -> np.ndarray:
+    # двусторонний бутстрэп-p: доля выборок по «другую сторону» нуля, умноженная на 2
+    valid = (~np.isnan(d)).sum(axis=0)
+    le = (d <= 0).sum(axis=0) / np.maximum(valid, 1)
+    ge = (d >= 0).sum(axis=0) / np.maximum(valid, 1)
+    return np.minimum(2 * np.minimum(le, ge), 1.0)
+
+
+def bootstrap(
+    sums: pd.DataFrame,
+    user: str,
+    group: str,
+    n_boot: int = 2000,
+    level: float = 0.95,
+    seed: int = 0,
+    chunk: int = 1000,
+) -> Bootstrap:
+    """Кластерный бутстрэп: с возвращением выбираются пользователи, а не отдельные ответы.
+
+    Суммы раскладываются в матрицы «пользователь × группа», каждая выборка —
+    вектор кратностей пользователей, и все выборки считаются одним матричным
+    умножением на блок из ``chunk`` выборок. Пользователь, ответивший в
+    нескольких группах, входит в выборку сразу во всех, поэтому попарные
+    сравнения учитывают эту связь.
+    """
+    if sums.empty:
+        empty = pd.DataFrame(columns=CI_COLUMNS, index=pd.Index([], name=group))
+        return Bootstrap(empty, pd.DataFrame(columns=PAIR_COLUMNS))
+    users = sums[user].astype(str).to_numpy()
+    groups = sums[group].astype(str).to_numpy()
+    u_codes, u_names = pd.factorize(users)
+    g_codes, g_names = pd.factorize(groups, sort=True)
+    n_users, n_groups = len(u_names), len(g_names)
+    mats = {}
+    for m in SUMS:
+        mat = np.zeros((n_users, n_groups))
+        np.add.at(mat, (u_codes, g_codes), sums[m].to_numpy("float64"))
+        mats[m] = mat
+    stacked = np.concatenate([mats[m] for m in SUMS], axis=1)  # U × 4G
+
+    rng = np.random.default_rng(seed)
+    acc = np.empty((n_boot, n_groups))
+    mean_t = np.empty((n_boot, n_groups))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for lo in range(0, n_boot, chunk):
+            b = min(chunk, n_boot - lo)
+            # кратности пользователей в b выборках: один bincount по сдвинутым индексам
+            idx = rng.integers(0, n_users, (b, n_users)) + (np.arange(b) * n_users)[:, None]
+            weights = np.bincount(idx.ravel(), minlength=b * n_users).reshape(b, n_users).astype("float64")
+            n, correct, t_n, t_sum = np.split(weights @ stacked, 4, axis=1)
+            acc[lo: lo + b] = correct / n
+            mean_t[lo: lo + b] = t_sum / t_n
+        total = {m: mats[m].sum(axis=0) for m in SUMS}
+        point_acc = total["correct"] / total["n"]
+        point_t = total["t_sum"] / total["t_n"]
+
+    acc_lo, acc_hi = _quantiles(acc, level)
+    t_lo, t_hi = _quantiles(mean_t, level)
+    ci = pd.DataFrame(
+        {
+            "users": (mats["n"] > 0).sum(axis=0),
+            "accuracy": point_acc, "acc_lo": acc_lo, "acc_hi": acc_hi,
+            "mean_t": point_t, "t_lo": t_lo, "t_hi": t_hi,
+        },
+        index=pd.Index(g_names, name=group),
+    )
+
+    pairs = list(combinations(range(n_groups), 2))
+    if not pairs:
+        return Bootstrap(ci, pd.DataFrame(columns=PAIR_COLUMNS))
+    a, b = map(np.array, zip(*pairs))
+    d_acc = acc[:, a] - acc[:, b]
+    d_t = mean_t[:, a] - mean_t[:, b]
+    d_lo, d_hi = _quantiles(d_acc, level)
+    return Bootstrap(ci, pd.DataFrame({
+        "a": g_names[a], "b": g_names[b],
+        "diff": point_acc[a] - point_acc[b], "lo": d_lo, "hi": d_hi, "p": _p_value(d_acc),
+        "diff_t": point_t[a] - point_t[b], "p_t": _p_value(d_t),
+    }))
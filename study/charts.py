@@ -0,0 +1,42 @@
+from __future__ import annotations
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+
+
+def highlight_max(v, top="#2ECC71", base="#1f77b4"):
+    m = max(v) if len(v) else None
+    return [top if x == m else base for x in v]
+
+
+def bar(data, highlight: str | None = None, legend_title: str | None = None, **kwargs) -> go.Figure:
+    fig = px.bar(data, **kwargs)
+    if highlight is not None:
+        fig.update_traces(marker_color=highlight_max(data[highlight]))
+    if legend_title is not None:
+        fig.update_layout(legend_title_text=legend_title)
+    return fig
+
+
+def histogram(
+    values,
+    nbins: int = 20,
+    q: float = 0.99,
+    title: str = "",
+    x_label: str = "",
+    y_label: str = "",
+) -> go.Figure:
+    """Гистограмма, посчитанная на сервере: в фигуру попадают только счётчики бинов.
+
+    Значения выше квантиля ``q`` отбрасываются, как и раньше.
+    """
+    v = np.asarray(values, dtype="float64")
+    v = v[~np.isnan(v)]
+    if len(v):
+        v = v[v <= np.quantile(v, q)]
+    counts, edges = np.histogram(v, bins=nbins)
+    fig = go.Figure(
+        go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), marker_line_width=0)
+    )
+    fig.update_layout(title=title, xaxis_title=x_label, yaxis_title=y_label, bargap=0)
+    return fig
@@ -0,0 +1,122 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from study import cube
+from study.schema import append
+
+
+class CompletionTracker:
+    """Инкрементальный фильтр «прошёл тест полностью» и куб по таким пользователям.
+
+    Хранит число ответов каждого пользователя и множество завершивших. Новые
+    строки только увеличивают счётчики; строки пользователя попадают в кадр
+    и куб в тот момент, когда число его ответов становится ровно ``required``,
+    и удаляются оттуда, если ответов стало больше.
+
+    ``update`` трогает только строки дельты и ячейки куба с их ключами. Кадр
+    ``frame`` собирается при чтении: отложенные строки вставляются на свои
+    места по метке (``searchsorted``), без сортировки всего кадра.
+    """
+
+    def __init__(self, user: str, required: int, dims: list[str]):
+        self.user, self.required, self.dims = user, required, dims
+        self.reset(pd.DataFrame())
+
+    def reset(self, df: pd.DataFrame) -> None:
+        self.counts: dict = {}
+        self.completed: set = set()
+        self._pending: dict[object, list[np.ndarray]] = {}
+        # метки строк каждого завершившего: по ним он убирается без прохода по кадру
+        self._members: dict[object, np.ndarray] = {}
+        self._full = df
+        self._frame = df.iloc[:0]
+        self._added: list[np.ndarray] = []
+        self._dropped: list[np.ndarray] = []
+        self._cells = None
+        if self.user in df.columns:
+            self._cells = cube.Cells(cube.build(self._frame, self.dims))
+            self._apply(df, df)
+
+    @property
+    def cube(self) -> pd.DataFrame | None:
+        return None if self._cells is None else self._cells.frame()
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        if self._added or self._dropped:
+            frame = self._frame
+            added = np.sort(np.concatenate(self._added)) if self._added else np.empty(0, np.int64)
+            if self._dropped:
+                gone = np.concatenate(self._dropped)
+                added = added[~np.isin(added, gone)]
+                frame = frame[~_present(frame.index.to_numpy(), gone)]
+            if len(added):
+                frame = _insert(frame, _rows(self._full, added))
+            self._frame, self._added, self._dropped = frame, [], []
+        return self._frame
+
+    def update(self, sheet) -> None:
+        if sheet.reloaded:
+            self.reset(sheet.frame)
+        else:
+            self._apply(sheet.delta, sheet.frame)
+
+    def _apply(self, delta: pd.DataFrame, full: pd.DataFrame) -> None:
+        if delta is None or delta.empty or self.user not in delta.columns:
+            return
+        if self._cells is None:
+            # при reset лист был пуст: куб заводится с первыми строками
+            self._frame = full.iloc[:0]
+            self._cells = cube.Cells(cube.build(self._frame, self.dims))
+        self._full = full
+        labels = delta.index.to_numpy()
+        promoted, demoted = [], []
+        for u, pos in delta.groupby(self.user, observed=True).indices.items():
+            before = self.counts.get(u, 0)
+            after = self.counts[u] = before + len(pos)
+            if before == self.required:
+                self.completed.discard(u)
+                demoted.append(self._members.pop(u))
+            elif after == self.required:
+                self.completed.add(u)
+                self._members[u] = np.concatenate(self._pending.pop(u, []) + [labels[pos]])
+                promoted.append(self._members[u])
+            elif after < self.required:
+                self._pending.setdefault(u, []).append(labels[pos])
+            else:
+                self._pending.pop(u, None)
+        if demoted:
+            gone = np.concatenate(demoted)
+            self._cells.add(cube.build(_rows(full, gone), self.dims), -1)
+            self._dropped.append(gone)
+        if promoted:
+            new = np.concatenate(promoted)
+            self._cells.add(cube.build(_rows(full, new), self.dims))
+            self._added.append(new)
+
+
+def _rows(full: pd.DataFrame, labels: np.ndarray) -> pd.DataFrame:
+    # метки листа возрастают, поэтому строки находятся двоичным поиском,
+    # без хэш-индекса по всему кадру
+    return full.iloc[full.index.searchsorted(labels)]
+
+
+def _present(index: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    # маска строк отсортированного индекса, метки которых есть в labels
+    pos = np.searchsorted(index, labels)
+    hit = pos < len(index)
+    hit[hit] = index[pos[hit]] == labels[hit]
+    mask = np.zeros(len(index), bool)
+    mask[pos[hit]] = True
+    return mask
+
+
+def _insert(frame: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    # слияние двух упорядоченных по метке кадров; обычно новые строки идут
+    # после всех прежних и хватает простого дописывания
+    at = frame.index.searchsorted(rows.index)
+    out = append(frame, rows)
+    if at[0] == len(frame):
+        return out
+    return out.iloc[np.insert(np.arange(len(frame)), at, np.arange(len(frame), len(out)))]
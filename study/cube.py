@@ -0,0 +1,135 @@
+from __future__ import annotations
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from study.schema import concat
+
+STAGE1_DIMS = ["Пользователь", "Алгоритм", "image_id", "Тип", "Вопрос", "date"]
+STAGE2_DIMS = ["user", "alg", "group", "qtype", "date"]
+MEASURES = ["n", "correct", "dont", "err_dont", "err_yes", "err_no", "t_n", "t_sum", "t_sq"]
+COUNTS = MEASURES[:7]
+FLOAT_MEASURES = MEASURES[7:]
+
+
+def build(df: pd.DataFrame, dims: list[str], time: str = "Время_сек") -> pd.DataFrame:
+    """Аддитивные суммы по самому мелкому зерну за один проход groupby.
+
+    Любую таблицу дашборда затем можно получить сворачиванием ячеек, а не
+    повторной агрегацией строк. Медианы и квантили так не считаются.
+    """
+    t = df[time]
+    wrong = ~df["is_correct"]
+    cells = df[dims].assign(
+        n=1,
+        correct=df["is_correct"].astype("int64"),
+        dont=df["is_dont_know"].astype("int64"),
+        err_dont=(wrong & df["is_dont_know"]).astype("int64"),
+        err_yes=(wrong & df["is_yes"]).astype("int64"),
+        err_no=(wrong & df["is_no"]).astype("int64"),
+        t_n=t.notna().astype("int64"),
+        t_sum=t.fillna(0),
+        t_sq=t.fillna(0) ** 2,
+    )
+    return cells.groupby(dims, observed=True, dropna=False, sort=False).sum().reset_index()
+
+
+class Cells:
+    """Куб с доступом к ячейке по ключу измерений.
+
+    ``add`` прибавляет (или вычитает) ячейки дельты к ячейкам с теми же
+    ключами, новые ключи дописываются в конец: время пропорционально размеру
+    дельты, а не куба. Плоский кадр ``frame()`` собирается при чтении и
+    хранится до следующего ``add``; опустевшие ячейки в него не попадают.
+    """
+
+    def __init__(self, cells: pd.DataFrame):
+        self.dims = [c for c in cells.columns if c not in MEASURES]
+        self._slots: dict[tuple, int] = {}
+        self._keys = [cells[self.dims].iloc[:0]]
+        self._counts = np.zeros((0, len(COUNTS)), np.int64)
+        self._times = np.zeros((0, len(FLOAT_MEASURES)))
+        self._size = 0
+        self._frame: pd.DataFrame | None = None
+        self.add(cells)
+
+    def add(self, cells: pd.DataFrame, sign: int = 1) -> None:
+        if cells.empty:
+            return
+        keys = cells[self.dims].astype(object)
+        keys = keys.where(keys.notna(), None)
+        slots = np.empty(len(cells), np.int64)
+        fresh = []
+        for i, key in enumerate(keys.itertuples(index=False, name=None)):
+            slot = self._slots.get(key)
+            if slot is None:
+                slot = self._slots[key] = self._size + len(fresh)
+                fresh.append(i)
+            slots[i] = slot
+        if fresh:
+            size = self._size + len(fresh)
+            if size > len(self._counts):
+                # запас растёт вдвое, чтобы дописывание стоило O(1) в среднем
+                rows = max(size, 2 * len(self._counts))
+                self._counts = _grow(self._counts, rows, self._size)
+                self._times = _grow(self._times, rows, self._size)
+            self._keys.append(cells[self.dims].iloc[fresh])
+            self._size = size
+        np.add.at(self._counts, slots, sign * cells[COUNTS].to_numpy(np.int64))
+        np.add.at(self._times, slots, sign * cells[FLOAT_MEASURES].to_numpy(np.float64))
+        self._frame = None
+
+    def frame(self) -> pd.DataFrame:
+        if self._frame is None:
+            if len(self._keys) > 1:
+                self._keys = [concat(self._keys)]
+            keys, counts, times = self._keys[0], self._counts[: self._size], self._times[: self._size]
+            live = counts[:, 0] != 0
+            if not live.all():
+                keys, counts, times = keys[live], counts[live], times[live]
+            # копии: буферы дальше меняются на месте, а отданный кадр — нет
+            self._frame = pd.concat([
+                keys.reset_index(drop=True),
+                pd.DataFrame(counts, columns=COUNTS, copy=True),
+                pd.DataFrame(times, columns=FLOAT_MEASURES, copy=True),
+            ], axis=1)
+        return self._frame
+
+
+def _grow(a: np.ndarray, rows: int, used: int) -> np.ndarray:
+    out = np.zeros((rows, a.shape[1]), a.dtype)
+    out[:used] = a[:used]
+    return out
+
+
+def covers(cube: pd.DataFrame, filters: dict[str, list]) -> bool:
+    return all(c in cube.columns for c, v in filters.items() if v)
+
+
+def restrict(
+    cube: pd.DataFrame,
+    filters: dict[str, list],
+    d_from: date | None = None,
+    d_to: date | None = None,
+) -> pd.DataFrame:
+    keep = pd.Series(True, index=cube.index)
+    for c, v in filters.items():
+        if v:
+            keep &= cube[c].isin(v)
+    if d_from is not None:
+        keep &= cube["date"] >= pd.Timestamp(d_from)
+    if d_to is not None:
+        keep &= cube["date"] <= pd.Timestamp(d_to)
+    return cube[keep]
+
+
+def rollup(cells: pd.DataFrame, by: str | list[str]) -> pd.DataFrame:
+    out = cells.groupby(by, observed=True)[MEASURES].sum()
+    out["accuracy"] = out["correct"] / out["n"]
+    out["mean_t"] = out["t_sum"] / out["t_n"]
+    return out
+
+
+def total(cells: pd.DataFrame) -> pd.Series:
+    return cells[MEASURES].sum()
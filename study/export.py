@@ -0,0 +1,40 @@
+from __future__ import annotations
+import gzip
+import io
+from typing import Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# формат -> (подпись, mime, расширение)
+FORMATS = {
+    "csv": ("CSV", "text/csv", ".csv"),
+    "csv.gz": ("CSV, gzip", "application/gzip", ".csv.gz"),
+    "parquet": ("Parquet", "application/vnd.apache.parquet", ".parquet"),
+}
+CHUNK_ROWS = 50_000
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[bytes]:
+    yield "\ufeff".encode("utf-8")
+    for i in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[i: i + chunk_rows].to_csv(index=False, header=i == 0).encode("utf-8")
+
+
+def build(df: pd.DataFrame, fmt: str, chunk_rows: int = CHUNK_ROWS) -> bytes:
+    sink = io.BytesIO()
+    if fmt == "parquet":
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for i in range(0, len(df), chunk_rows):
+                chunk = df.iloc[i: i + chunk_rows]
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+        return sink.getvalue()
+    out = gzip.GzipFile(fileobj=sink, mode="wb", mtime=0) if fmt == "csv.gz" else sink
+    for part in iter_csv(df, chunk_rows):
+        out.write(part)
+    if out is not sink:
+        out.close()
+    return sink.getvalue()
+
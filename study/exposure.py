@@ -0,0 +1,49 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+
+class FirstExposure:
+    """Индекс первого показа: для каждой пары ключей — самая ранняя строка.
+
+    Обновляется только по новым строкам; ``labels()`` отдаёт метки строк
+    первых показов, и срез под фильтр делается через ``isin`` по индексу без
+    пересортировки всего подмножества.
+    """
+
+    def __init__(self, keys: list[str], kind: str, value: str, time: str = "timestamp"):
+        self.keys, self.kind, self.value, self.time = keys, kind, value, time
+        self.reset(pd.DataFrame())
+
+    def reset(self, df: pd.DataFrame) -> None:
+        self.first: dict[tuple, tuple[int, int]] = {}
+        self._labels: np.ndarray | None = None
+        self._apply(df)
+
+    def update(self, sheet) -> None:
+        if sheet.reloaded:
+            self.reset(sheet.frame)
+        else:
+            self._apply(sheet.delta)
+
+    def labels(self) -> np.ndarray:
+        if self._labels is None:
+            self._labels = np.fromiter(
+                (lab for _, lab in self.first.values()), dtype="int64", count=len(self.first)
+            )
+        return self._labels
+
+    def _apply(self, delta: pd.DataFrame | None) -> None:
+        if delta is None or delta.empty or self.kind not in delta.columns:
+            return
+        rows = delta[delta[self.kind] == self.value]
+        if rows.empty:
+            return
+        rows = rows.sort_values(self.time, kind="stable").drop_duplicates(self.keys)
+        ts = rows[self.time].to_numpy("datetime64[ns]").view("int64")
+        keys = zip(*(rows[k].tolist() for k in self.keys))
+        for key, t, lab in zip(keys, ts, rows.index.tolist()):
+            cur = self.first.get(key)
+            if cur is None or t < cur[0]:
+                self.first[key] = (t, lab)
+        self._labels = None
@@ -0,0 +1,56 @@
+from __future__ import annotations
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+class FilterIndex:
+    """Инвертированный индекс фильтров боковой панели для одного снимка данных.
+
+    Для каждого значения измерения хранится массив позиций строк, для дат —
+    отсортированный порядок. Смена фильтра сводится к объединению и
+    пересечению битовых масок и двоичному поиску по датам, без сканирования
+    всего кадра.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list[str], time: str = "date"):
+        self.n = len(df)
+        self.postings: dict[str, dict] = {}
+        for col in columns:
+            codes, uniques = pd.factorize(df[col])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            self.postings[col] = {
+                v: order[bounds[i]: bounds[i + 1]] for i, v in enumerate(uniques)
+            }
+        times = df[time].to_numpy()
+        self._order = np.argsort(times, kind="stable")
+        self._times = times[self._order]
+
+    def values(self, col: str) -> list:
+        return sorted(self.postings[col])
+
+    def date_range(self) -> tuple[date, date]:
+        # NaT при сортировке уходят в конец; если дат нет совсем, диапазон — сегодня
+        valid = self._times[~np.isnat(self._times)]
+        if not len(valid):
+            today = date.today()
+            return today, today
+        return tuple(pd.Timestamp(t).date() for t in (valid[0], valid[-1]))
+
+    def select(self, filters: dict[str, list], d_from: date, d_to: date) -> np.ndarray:
+        lo = np.searchsorted(self._times, np.datetime64(d_from), side="left")
+        hi = np.searchsorted(self._times, np.datetime64(d_to), side="right")
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self._order[lo:hi]] = True
+        for col, chosen in filters.items():
+            if not chosen:
+                continue
+            hit = np.zeros(self.n, dtype=bool)
+            postings = self.postings[col]
+            for v in chosen:
+                if v in postings:
+                    hit[postings[v]] = True
+            mask &= hit
+        return np.flatnonzero(mask)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, TypeVar
+
+from study.metrics import METRICS
+
+T = TypeVar("T")
+
+
+class LRUCache(Generic[T]):
+    """Потокобезопасный кэш готовых артефактов (файлов, фигур) с вытеснением LRU.
+
+    Если задано ``name``, попадания и промахи ``get()`` учитываются в ``METRICS``.
+    """
+
+    def __init__(self, max_entries: int = 8, name: str | None = None):
+        self.max_entries, self.name = max_entries, name
+        self._items: OrderedDict[tuple, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._items
+
+    def get(self, key: tuple, make: Callable[[], T]) -> T:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                if self.name:
+                    METRICS.count(self.name, True)
+                return self._items[key]
+        if self.name:
+            METRICS.count(self.name, False)
+        value = make()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return value
@@ -0,0 +1,115 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+_PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss() -> int:
+    # текущий RSS процесса; там, где нет /proc, дельта памяти просто будет нулевой
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+@dataclass
+class Span:
+    name: str
+    rows_in: int | None = None
+    rows_out: int | None = None
+    seconds: float = 0.0
+    mem_delta: int = 0
+    at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="milliseconds"))
+
+
+class Metrics:
+    """Замеры этапов конвейера и счётчики попаданий в кэши на весь процесс.
+
+    ``span()`` меряет длительность, число строк на входе и выходе и прирост
+    RSS; последние ``keep`` замеров хранятся в памяти для панели отладки и,
+    если вызван ``log_to()``, пишутся строками JSON в ротируемый файл. Память
+    общая для всех потоков, так что её дельта — оценка, а не точное значение.
+    """
+
+    def __init__(self, keep: int = 500):
+        self.spans: deque[Span] = deque(maxlen=keep)
+        self.counters: Counter[str] = Counter()
+        self.log = logging.getLogger("study.metrics")
+        self.log.propagate = False
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, rows_in: int | None = None) -> Iterator[Span]:
+        s = Span(name, rows_in)
+        rss, t = _rss(), time.perf_counter()
+        try:
+            yield s
+        finally:
+            s.seconds = time.perf_counter() - t
+            s.mem_delta = _rss() - rss
+            with self._lock:
+                self.spans.append(s)
+            if self.log.handlers:
+                self.log.info(json.dumps({"kind": "span", **asdict(s)}, ensure_ascii=False))
+
+    def count(self, name: str, hit: bool) -> None:
+        key = f"{name}.{'hit' if hit else 'miss'}"
+        with self._lock:
+            self.counters[key] += 1
+        if self.log.handlers:
+            self.log.info(json.dumps({"kind": "counter", "name": key}, ensure_ascii=False))
+
+    def log_to(self, path: str, max_bytes: int = 5 * 2**20, backups: int = 3) -> None:
+        path = os.path.abspath(path)
+        if any(getattr(h, "baseFilename", None) == path for h in self.log.handlers):
+            return
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self.log.addHandler(handler)
+        self.log.setLevel(logging.INFO)
+
+    def summary(self) -> pd.DataFrame:
+        with self._lock:
+            spans = list(self.spans)
+        if not spans:
+            return pd.DataFrame()
+        df = pd.DataFrame([asdict(s) for s in spans])
+        g = df.groupby("name", sort=True)
+        ms = g["seconds"]
+        return pd.DataFrame({
+            "Замеров": g.size(),
+            "p50, мс": ms.median() * 1000,
+            "p90, мс": ms.quantile(0.9) * 1000,
+            "Последний, мс": ms.last() * 1000,
+            "Строк на входе": g["rows_in"].last(),
+            "Строк на выходе": g["rows_out"].last(),
+            "Память, МБ": g["mem_delta"].last() / 2**20,
+        }).round(2).reset_index()
+
+    def hit_rates(self) -> pd.DataFrame:
+        with self._lock:
+            counters = dict(self.counters)
+        names = sorted({k.rsplit(".", 1)[0] for k in counters})
+        hits = np.array([counters.get(f"{n}.hit", 0) for n in names])
+        misses = np.array([counters.get(f"{n}.miss", 0) for n in names])
+        total = np.maximum(hits + misses, 1)
+        return pd.DataFrame({
+            "name": names, "Попаданий": hits, "Промахов": misses, "Доля попаданий": (hits / total).round(3),
+        })
+
+
+METRICS = Metrics()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+
+def _ranks(s: pd.Series) -> np.ndarray:
+    # ранг значения в лексикографическом порядке, -1 для пропусков; словарь
+    # категорий после дочитывания не отсортирован, поэтому коды не годятся
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        rank = np.argsort(np.argsort(s.cat.categories.astype(str), kind="stable"))
+        codes = s.cat.codes.to_numpy()
+        return np.where(codes >= 0, rank[codes], -1)
+    return pd.factorize(s, sort=True)[0]
+
+
+def search(df: pd.DataFrame, text: str) -> np.ndarray:
+    """Позиции строк, где текст встречается хотя бы в одной колонке (без учёта регистра)."""
+    if not text:
+        return np.arange(len(df))
+    text = text.lower()
+    hit = np.zeros(len(df), dtype=bool)
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            cats = s.cat.categories.astype(str).str.lower().str.contains(text, regex=False)
+            hit |= np.isin(s.cat.codes.to_numpy(), np.flatnonzero(cats))
+        elif s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            hit |= s.astype(str).str.lower().str.contains(text, regex=False).to_numpy()
+    return np.flatnonzero(hit)
+
+
+def order(
+    df: pd.DataFrame,
+    sort_by: str | None = None,
+    descending: bool = False,
+    text: str = "",
+) -> np.ndarray:
+    """Позиции строк после поиска и сортировки; страницу режет вызывающий код."""
+    pos = search(df, text)
+    if sort_by:
+        ranks = _ranks(df[sort_by])[pos]
+        keys = np.where(ranks < 0, np.iinfo(np.int64).max, -ranks if descending else ranks)
+        pos = pos[np.argsort(keys, kind="stable")]
+    return pos
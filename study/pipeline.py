@@ -0,0 +1,117 @@
+from __future__ import annotations
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from study import cube
+from study.completion import CompletionTracker
+from study.exposure import FirstExposure
+from study.metrics import METRICS
+from study.sessions import Funnel, analyze
+from study.sheets import Parser, parse_stage1, parse_stage2
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    parse: Parser
+    user: str
+    required: int
+    dims: list[str]
+    # колонки сессии, алгоритма и изображения для воронки отказов
+    session: str
+    alg: str
+    image: str
+    # (ключи, колонка типа, значение) для индекса первого показа или None
+    first: tuple[list[str], str, str] | None = None
+
+
+STAGES = {
+    "stage1": Stage(
+        "stage1", parse_stage1, "Пользователь", 40, cube.STAGE1_DIMS,
+        "session_id", "Алгоритм", "image_id",
+        (["Пользователь", "image_id"], "Тип", "letters"),
+    ),
+    # во втором этапе нет session_id: сессией считается пользователь
+    "stage2": Stage("stage2", parse_stage2, "user", 15, cube.STAGE2_DIMS, "user", "alg", "group"),
+}
+
+
+class StagePipeline:
+    """Всё, что считается по одному листу: фильтр завершивших, куб, первые показы
+    и воронка сессий по полному логу, включая незавершивших.
+
+    Одна и та же обработка идёт и в приложении, и в фоновом воркере.
+
+    Дельта листа приходит один раз: если ``update()`` оборвался, конвейер
+    помечается устаревшим (``stale``) и следующий ``update()`` пересчитывает
+    всё по ``sheet.frame``.
+    """
+
+    def __init__(self, stage: Stage):
+        self.stage = stage
+        self.done = CompletionTracker(stage.user, stage.required, stage.dims)
+        self.first = FirstExposure(*stage.first) if stage.first else None
+        self.funnel: Funnel | None = None
+        self.stale = False
+
+    def reset(self, df: pd.DataFrame) -> None:
+        self.stale = True
+        self.done.reset(df)
+        if self.first is not None:
+            self.first.reset(df)
+        self._sessions(df)
+        self.stale = False
+
+    def update(self, sheet) -> None:
+        if self.stale:
+            self.reset(sheet.frame)
+            return
+        self.stale = True
+        self._update(sheet)
+        self.stale = False
+
+    def _update(self, sheet) -> None:
+        name = self.stage.name
+        with METRICS.span(f"completion.{name}", len(sheet.delta)) as span:
+            self.done.update(sheet)
+            span.rows_out = len(self.done.frame)
+        if self.first is not None:
+            with METRICS.span(f"first_exposure.{name}", len(sheet.delta)):
+                self.first.update(sheet)
+        if sheet.reloaded or len(sheet.delta):
+            self._sessions(sheet.frame)
+
+    def _sessions(self, df: pd.DataFrame) -> None:
+        # воронка пересчитывается целиком: одна сортировка и проход по отрезкам
+        s = self.stage
+        if not {s.session, s.user, s.alg, s.image, "qnum", "timestamp"} <= set(df.columns):
+            self.funnel = None
+            return
+        with METRICS.span(f"sessions.{s.name}", len(df)) as span:
+            self.funnel = analyze(df, s.session, s.user, s.alg, s.image, s.required)
+            span.rows_out = len(self.funnel.sessions)
+
+    def artifacts(self) -> dict[str, pd.DataFrame]:
+        out = {"frame": self.done.frame}
+        if self.done.cube is not None:
+            out["cube"] = self.done.cube
+        if self.first is not None:
+            out["first"] = pd.DataFrame({"label": self.first.labels()})
+        if self.funnel is not None:
+            out.update(self.funnel.frames())
+        return out
+
+
+def fields(artifacts: dict[str, dict[str, pd.DataFrame]]) -> dict:
+    """Поля ``Snapshot`` из артефактов обоих этапов."""
+    s1, s2 = artifacts["stage1"], artifacts["stage2"]
+    first = s1.get("first")
+    return {
+        "stage1": s1["frame"], "cube1": s1.get("cube"),
+        "stage2": s2["frame"], "cube2": s2.get("cube"),
+        "first1": None if first is None else first["label"].to_numpy(np.int64),
+        "funnel1": Funnel.from_frames(s1),
+        "funnel2": Funnel.from_frames(s2),
+    }
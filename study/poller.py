@@ -0,0 +1,102 @@
+from __future__ import annotations
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from study.metrics import METRICS
+from study.sessions import Funnel
+
+log = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: str
+    stage1: pd.DataFrame
+    stage2: pd.DataFrame
+    cube1: pd.DataFrame | None = None
+    cube2: pd.DataFrame | None = None
+    first1: np.ndarray | None = None
+    funnel1: Funnel | None = None
+    funnel2: Funnel | None = None
+    loaded_at: datetime = field(default_factory=datetime.now)
+
+
+# возвращает поля снимка с ключом "version" или None, если данные не менялись
+Fetch = Callable[[], "dict | None"]
+
+
+class Poller:
+    """Один фоновый поток на процесс, который опрашивает таблицы и публикует снимок.
+
+    Сессии читают ``latest()`` без блокировки; ``poll()`` защищён от
+    параллельных вызовов: пока идёт загрузка, остальные ждут её результата,
+    а не запускают свою. Снимок с той же версией, что и текущий, не
+    публикуется, поэтому всё, что закэшировано по версии, остаётся в силе.
+    """
+
+    def __init__(self, fetch: Fetch, interval: float):
+        self.fetch, self.interval = fetch, interval
+        self.error: BaseException | None = None
+        self._snapshot: Snapshot | None = None
+        self._polls = 0
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="study-poller", daemon=True)
+
+    def start(self) -> Poller:
+        self._thread.start()
+        return self
+
+    def seed(self, **fields) -> None:
+        # снимок с диска: показываем сразу, пока поток сверяется с таблицей
+        with self._lock:
+            self._publish(fields)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def latest(self, timeout: float | None = None) -> Snapshot | None:
+        if self._snapshot is None:
+            self._ready.wait(timeout)
+        return self._snapshot
+
+    def poll(self) -> Snapshot | None:
+        seen = self._polls
+        with self._lock:
+            if self._polls != seen:
+                return self._snapshot
+            try:
+                fields = self.fetch()
+            except Exception as exc:
+                log.exception("не удалось обновить данные")
+                self.error = exc
+                self._ready.set()
+                return self._snapshot
+            finally:
+                self._polls += 1
+            self.error = None
+            if fields is None:
+                METRICS.count("poller.snapshot", True)
+            else:
+                self._publish(fields)
+            self._ready.set()
+            return self._snapshot
+
+    def _publish(self, fields: dict) -> None:
+        fresh = self._snapshot is None or self._snapshot.version != fields["version"]
+        METRICS.count("poller.snapshot", not fresh)
+        if fresh:
+            self._snapshot = Snapshot(**fields)
+        self._ready.set()
+
+    def _run(self) -> None:
+        self.poll()
+        while not self._stop.wait(self.interval):
+            self.poll()
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import pandas as pd
+
+STAGE1_CATEGORIES = ["Пользователь", "Алгоритм", "image_id", "Тип", "Вопрос"]
+STAGE2_CATEGORIES = ["user", "alg", "qtype", "group"]
+YES_ANSWERS = ["да", "yes", "y"]
+FLAGS = ["is_dont_know", "is_yes", "is_no"]
+DERIVED = FLAGS + ["date"]
+
+
+def normalize(df: pd.DataFrame, answer: str, categories: list[str]) -> pd.DataFrame:
+    """Приводит кадр к компактной схеме один раз при загрузке.
+
+    Текстовые измерения становятся категориями, а признаки ответа и дата
+    считаются здесь, чтобы дальше не сканировать строки на каждом перезапуске.
+    """
+    for c in categories:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    text = df[answer].astype(str).str.lower()
+    df["is_dont_know"] = text.str.startswith("затруд")
+    df["is_yes"] = text.str.strip().isin(YES_ANSWERS)
+    df["is_no"] = text.str.strip() == "нет"
+    df["date"] = df["timestamp"].dt.normalize()
+    return df
+
+
+def append(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    # pd.concat превращает категории с разными словарями в object, поэтому
+    # сначала дополняем словари друг другом
+    if b.empty:
+        return a
+    if a.empty:
+        return b
+    a_cols, b_cols = {}, {}
+    for c in a.columns:
+        if isinstance(a[c].dtype, pd.CategoricalDtype) and c in b.columns:
+            cats = a[c].cat.categories
+            extra = b[c].astype("category").cat.categories.difference(cats)
+            if len(extra):
+                cats = cats.append(extra)
+                a_cols[c] = _extend(a[c], cats)
+            b_cols[c] = pd.Categorical(b[c], categories=cats)
+    return pd.concat([a.assign(**a_cols), b.assign(**b_cols)])
+
+
+def concat(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """``append`` для нескольких кадров сразу: словари объединяются один раз и один ``pd.concat``."""
+    parts = [f for f in frames if not f.empty]
+    if len(parts) < 2:
+        return parts[0] if parts else frames[0]
+    first = parts[0]
+    cols = {}
+    for c in first.columns:
+        if isinstance(first[c].dtype, pd.CategoricalDtype) and all(c in f.columns for f in parts):
+            cats = first[c].cat.categories
+            for f in parts[1:]:
+                extra = f[c].astype("category").cat.categories.difference(cats)
+                if len(extra):
+                    cats = cats.append(extra)
+            cols[c] = cats
+    return pd.concat(
+        [first.assign(**{c: _extend(first[c], cats) for c, cats in cols.items()})]
+        + [f.assign(**{c: pd.Categorical(f[c], categories=cats) for c, cats in cols.items()}) for f in parts[1:]]
+    )
+
+
+def _extend(col: pd.Series, cats: pd.Index) -> pd.Categorical:
+    # словарь только дописан в конец, поэтому коды прежних строк остаются верными;
+    # перекодирование по значениям хэшировало бы всю колонку
+    return pd.Categorical.from_codes(col.cat.codes.to_numpy(), dtype=pd.CategoricalDtype(cats))
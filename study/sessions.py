@@ -0,0 +1,135 @@
+from __future__ import annotations
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Funnel:
+    answers: pd.DataFrame   # ответы в порядке (сессия, время) с задержкой до предыдущего
+    sessions: pd.DataFrame  # по сессии: начало, конец, длительность, ответы сессии и пользователя, итог
+    steps: pd.DataFrame     # по номеру вопроса: дошло сессий, бросили на нём, задержка
+    dropout: pd.DataFrame   # по (алгоритм, изображение): показов, брошено после, доля
+
+    def frames(self) -> dict[str, pd.DataFrame]:
+        return {f"funnel_{k}": getattr(self, k) for k in ("answers", "sessions", "steps", "dropout")}
+
+    @classmethod
+    def from_frames(cls, frames: dict[str, pd.DataFrame]) -> Funnel | None:
+        try:
+            return cls(**{k: frames[f"funnel_{k}"] for k in ("answers", "sessions", "steps", "dropout")})
+        except KeyError:
+            return None
+
+
+def analyze(
+    df: pd.DataFrame,
+    session: str,
+    user: str,
+    alg: str,
+    image: str,
+    required: int,
+    qnum: str = "qnum",
+    time: str = "timestamp",
+) -> Funnel:
+    """Сессии, воронка по номерам вопросов и точки отказа по полному логу.
+
+    Берутся все строки, включая незавершивших. Одна сортировка по (сессия,
+    время), дальше только операции над отрезками: границы сессий, разности
+    соседних меток времени и ``reduceat`` по отрезкам.
+
+    Итог решается по пользователю, как в ``CompletionTracker``: ответы всех
+    его сессий складываются, и итог приписывается его последней сессии. Она
+    завершена, если ответов ровно ``required``, и брошена, если меньше, —
+    тогда её последний ответ считается точкой отказа. Более ранние сессии
+    того же пользователя (он вернулся в новой) и пользователи с лишними
+    ответами не считаются ни завершёнными, ни брошенными. Во втором этапе
+    сессией служит сам пользователь (``session == user``).
+    """
+    df = df[df[time].notna()]
+    codes, names = pd.factorize(df[session].astype(str))
+    ts = df[time].to_numpy("datetime64[ns]").view("int64")
+    order = np.lexsort((ts, codes))
+    codes, ts = codes[order], ts[order]
+    # номеров вопросов немного: в число переводятся только уникальные значения
+    q_codes, q_values = pd.factorize(df[qnum])
+    q_values = np.r_[pd.to_numeric(pd.Series(q_values), errors="coerce").to_numpy("float64"), np.nan]
+    q = q_values[q_codes[order]]
+    n = len(order)
+
+    def take(col: str, pos=order) -> pd.Series:
+        # категории сохраняются, строки не материализуются
+        return df[col].iloc[pos].reset_index(drop=True)
+
+    first = np.r_[True, codes[1:] != codes[:-1]] if n else np.zeros(0, dtype=bool)
+    starts = np.flatnonzero(first)
+    ends = np.r_[starts[1:], n] - 1 if n else starts
+    dwell = np.r_[np.nan, np.diff(ts) / 1e9] if n else np.zeros(0)
+    dwell[first] = np.nan
+
+    answers = pd.DataFrame({session: pd.Categorical.from_codes(codes, names)})
+    if user != session:
+        answers[user] = take(user)
+    answers[qnum] = q
+    answers[time] = take(time)
+    answers[alg] = take(alg)
+    answers[image] = take(image)
+    answers["dwell_s"] = dwell
+
+    count = np.diff(np.r_[starts, n])
+    last_q = np.fmax.reduceat(np.nan_to_num(q, nan=0), starts) if n else np.zeros(0)
+    # пользователь сессии — по её первому ответу; его ответы во всех сессиях
+    # складываются, итог получает только последняя по времени сессия
+    if user == session:
+        owner = np.arange(len(starts))
+    else:
+        owner = pd.factorize(answers[user].iloc[starts].astype(str))[0]
+    total = np.bincount(owner, weights=count, minlength=len(starts)).astype("int64")[owner]
+    by_owner = np.lexsort((ts[starts], owner))
+    ordered = owner[by_owner]
+    last = np.r_[ordered[1:] != ordered[:-1], True] if n else np.zeros(0, dtype=bool)
+    final = np.zeros(len(starts), dtype=bool)
+    final[by_owner[last]] = True
+    completed = final & (total == required)
+    abandoned = final & (total < required)
+    sessions = pd.DataFrame({session: answers[session].iloc[starts].reset_index(drop=True)})
+    if user != session:
+        sessions[user] = answers[user].iloc[starts].reset_index(drop=True)
+    sessions["start"] = answers[time].iloc[starts].reset_index(drop=True)
+    sessions["end"] = answers[time].iloc[ends].reset_index(drop=True)
+    sessions["duration_s"] = (ts[ends] - ts[starts]) / 1e9
+    sessions["answers"] = count
+    sessions["user_answers"] = total
+    sessions["last_qnum"] = last_q.astype("int64")
+    sessions["completed"] = completed
+    sessions["abandoned"] = abandoned
+    sessions["continued"] = ~final
+    sessions[alg] = answers[alg].iloc[ends].reset_index(drop=True)
+    sessions[image] = answers[image].iloc[ends].reset_index(drop=True)
+
+    # дошли до вопроса k — сессии, у которых последний номер не меньше k
+    top = int(last_q.max()) if len(last_q) else 0
+    last = np.bincount(last_q.astype("int64"), minlength=top + 1)
+    dropped = np.bincount(last_q[abandoned].astype("int64"), minlength=top + 1)
+    valid = ~np.isnan(dwell) & ~np.isnan(q)
+    qi = q[valid].astype("int64")
+    d_sum = np.bincount(qi, dwell[valid], minlength=top + 1)[: top + 1]
+    d_n = np.bincount(qi, minlength=top + 1)[: top + 1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        steps = pd.DataFrame({
+            qnum: np.arange(1, top + 1),
+            "reached": last[::-1].cumsum()[::-1][1:],
+            "dropped": dropped[1:],
+            "mean_dwell_s": (d_sum / d_n)[1:],
+        })
+    steps["drop_rate"] = steps["dropped"] / steps["reached"].where(steps["reached"] > 0)
+    med = answers.loc[valid, [qnum, "dwell_s"]].groupby(qnum)["dwell_s"].median()
+    steps["median_dwell_s"] = steps[qnum].map(med)
+
+    shown = answers.groupby([alg, image], observed=True).size().rename("shown")
+    quit_ = sessions[abandoned].groupby([alg, image], observed=True).size().rename("dropped")
+    dropout = pd.concat([shown, quit_], axis=1).fillna({"dropped": 0})
+    dropout["dropped"] = dropout["dropped"].astype("int64")
+    dropout["drop_rate"] = dropout["dropped"] / dropout["shown"]
+    return Funnel(answers, sessions, steps, dropout.reset_index())
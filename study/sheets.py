@@ -0,0 +1,283 @@
+from __future__ import annotations
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+from gspread.exceptions import APIError
+
+from study.metrics import METRICS
+from study.schema import STAGE1_CATEGORIES, STAGE2_CATEGORIES, append, concat, normalize
+
+STAGE1_COLS = [
+    "timestamp", "Пользователь", "qnum", "image_id", "Алгоритм", "Тип",
+    "Вопрос", "Ответ", "Правильный_ответ", "time_ms", "is_correct", "session_id"
+]
+TRUE_VALUES = ["TRUE", "1", "YES"]
+
+Parser = Callable[[list, int, list], pd.DataFrame]
+
+
+def _col_letter(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def _trim(row: list) -> list:
+    # get_values и get_all_values по-разному добивают хвост пустыми ячейками
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def _digest(rows: list, start: int) -> int:
+    # сумма хэшей строк вместе с их номерами: дочитанный хвост прибавляется к
+    # уже посчитанной сумме и даёт то же число, что и полное перечитывание
+    if not rows:
+        return 0
+    keys = np.array(
+        [f"{start + i}\x1f" + "\x1f".join(_trim(r)) for i, r in enumerate(rows)], dtype=object
+    )
+    return int(pd.util.hash_array(keys).sum(dtype="uint64"))
+
+
+def _finish(df: pd.DataFrame) -> pd.DataFrame:
+    df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
+    df["time_ms"] = pd.to_numeric(df["time_ms"], errors="coerce")
+    df["Время_сек"] = df["time_ms"] / 1000
+    df["is_correct"] = (
+        df["is_correct"].astype(str).str.strip().str.upper().isin(TRUE_VALUES)
+    )
+    return df
+
+
+def parse_stage1(rows: list, start: int, header: list) -> pd.DataFrame:
+    if start == 0 and rows and rows[0][:3] == STAGE1_COLS[:3]:
+        rows, start = rows[1:], 1
+    if not rows:
+        return normalize(_finish(pd.DataFrame(columns=STAGE1_COLS)), "Ответ", STAGE1_CATEGORIES)
+    w = len(STAGE1_COLS)
+    df = pd.DataFrame(
+        [list(r[:w]) + [""] * (w - len(r)) for r in rows],
+        columns=STAGE1_COLS,
+        index=range(start, start + len(rows)),
+    )
+    df = _finish(df).dropna(subset=["timestamp"])
+    return normalize(df, "Ответ", STAGE1_CATEGORIES)
+
+
+def parse_stage2(rows: list, start: int, header: list) -> pd.DataFrame:
+    if start == 0:
+        rows, start = rows[1:], 1
+    if not header:
+        return pd.DataFrame()
+    # лист из одного заголовка даёт пустой кадр с его колонками, а не безымянный
+    w = len(header)
+    df = pd.DataFrame(
+        [list(r[:w]) + [""] * (w - len(r)) for r in rows],
+        columns=header,
+        index=range(start, start + len(rows)),
+    )
+    return normalize(_finish(df), "answer", STAGE2_CATEGORIES)
+
+
+def fingerprint(watermark: dict) -> str:
+    return f"{watermark['n']}-{watermark['digest']:016x}"
+
+
+class IncrementalSheet:
+    """Кэш листа, который дочитывает только строки, добавленные после прошлого запроса.
+
+    От листа нужны лишь ``get_all_values()`` и ``get_values(range)``, поэтому
+    в тестах его легко заменить локальной заглушкой. Последняя прочитанная
+    строка запрашивается повторно: если она изменилась или исчезла, лист
+    перечитывается целиком; раз в ``full_every`` обновлений — тоже, чтобы
+    поймать правки в середине.
+
+    ``fingerprint`` — номер последней строки плюс сумма хэшей прочитанных
+    строк; он служит версией данных. Дописанные строки и правка последней
+    строки меняют его в том же запросе, а правка в середине листа видна
+    только после полной перезагрузки, то есть с задержкой до ``full_every``
+    обновлений: до тех пор версия и всё, что кэшируется по ней, прежние.
+    """
+
+    def __init__(self, ws, parse: Parser, full_every: int = 20, name: str | None = None):
+        self.ws, self.parse, self.full_every = ws, parse, full_every
+        self.name = name or getattr(ws, "title", "sheet")
+        self.frame: pd.DataFrame | None = None
+        self.delta: pd.DataFrame | None = None
+        self.reloaded = False
+        self.header: list = []
+        self.n = 0
+        self.tail: list = []
+        self.digest = 0
+        self._since_full = 0
+        self._lock = threading.Lock()
+
+    def watermark(self) -> dict:
+        return {"n": self.n, "tail": self.tail, "header": self.header, "digest": self.digest}
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.watermark())
+
+    def restore(self, frame: pd.DataFrame, watermark: dict) -> None:
+        with self._lock:
+            self.frame, self.delta = frame, frame
+            self.n, self.tail = watermark["n"], watermark["tail"]
+            self.header = watermark["header"]
+            self.digest = watermark["digest"]
+            self.reloaded = True
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            if self.frame is None or self.n == 0 or self._since_full >= self.full_every:
+                return self._reload()
+            width = _col_letter(max(len(self.header), len(self.tail), 1))
+            try:
+                with METRICS.span(f"fetch.{self.name}") as span:
+                    rows = self.ws.get_values(f"A{self.n}:{width}")
+                    span.rows_out = len(rows)
+            except APIError:
+                return self._reload()
+            if not rows or _trim(rows[0]) != self.tail:
+                return self._reload()
+            self._since_full += 1
+            self.reloaded = False
+            new = rows[1:]
+            if not new:
+                # лист не менялся: ни разбора, ни новых кадров
+                self.delta = self.frame.iloc[:0]
+                return self.frame
+            with METRICS.span(f"parse.{self.name}", len(new)) as span:
+                self.delta = self.parse(new, self.n, self.header)
+                span.rows_out = len(self.delta)
+            self.frame = append(self.frame, self.delta)
+            self.digest = (self.digest + _digest(new, self.n)) % 2**64
+            self.n += len(new)
+            self.tail = _trim(new[-1])
+            return self.frame
+
+    def _reload(self) -> pd.DataFrame:
+        with METRICS.span(f"fetch_all.{self.name}") as span:
+            rows = self.ws.get_all_values()
+            span.rows_out = len(rows)
+        self.header = list(rows[0]) if rows else []
+        self.n = len(rows)
+        self.tail = _trim(rows[-1]) if rows else []
+        self.digest = _digest(rows, 0)
+        with METRICS.span(f"parse_all.{self.name}", len(rows)) as span:
+            self.frame = self.delta = self.parse(rows, 0, self.header)
+            span.rows_out = len(self.frame)
+        self.reloaded, self._since_full = True, 0
+        return self.frame
+
+
+# шаг меток строк между шардами: метки уникальны во всём объединённом кадре
+SHARD_STRIDE = 10**9
+
+
+def _shifted(parse: Parser, offset: int, rows: list, start: int, header: list) -> pd.DataFrame:
+    df = parse(rows, start, header)
+    if offset:
+        df.index = df.index + offset
+    return df
+
+
+class ShardedSheet:
+    """Журнал ответов, разбитый на несколько листов-шардов, как один кадр.
+
+    Каждый шард — ``IncrementalSheet`` со своим сдвигом меток строк
+    (``SHARD_STRIDE`` на позицию), поэтому метки в объединённом кадре не
+    пересекаются. Последний шард активный и опрашивается каждый раз;
+    закрытые загружаются один раз (параллельно) и дальше не запрашиваются,
+    кроме одного дочитывания хвоста при закрытии и после ``restore()``.
+    Интерфейс тот же, что у ``IncrementalSheet``: ``frame``, ``delta``,
+    ``reloaded``, ``watermark()``, ``restore()``, ``refresh()``.
+    """
+
+    def __init__(self, shards: list, parse: Parser, name: str, full_every: int = 20, workers: int = 4):
+        self.parse, self.name, self.full_every = parse, name, full_every
+        self.parts: list[IncrementalSheet] = []
+        self.frame: pd.DataFrame | None = None
+        self.delta: pd.DataFrame | None = None
+        self.reloaded = False
+        self._sealing: list[IncrementalSheet] = []
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"study-{name}")
+        self.extend(shards)
+        self._sealing = []  # при создании дочитывать нечего: всё загрузится в первом refresh
+
+    @property
+    def titles(self) -> list[str]:
+        return [getattr(p.ws, "title", "") for p in self.parts]
+
+    def extend(self, shards: list) -> None:
+        """Добавляет новые шарды в конец; прежний активный дочитывается последний раз."""
+        for ws in shards[len(self.parts):]:
+            if self.parts:
+                self._sealing.append(self.parts[-1])
+            offset = len(self.parts) * SHARD_STRIDE
+            title = getattr(ws, "title", "")
+            name = self.name if not self.parts and len(shards) == 1 else f"{self.name}:{title}"
+            self.parts.append(
+                IncrementalSheet(ws, partial(_shifted, self.parse, offset), self.full_every, name=name)
+            )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False)
+
+    def watermark(self) -> dict:
+        digest = sum(p.digest * (i + 1) for i, p in enumerate(self.parts)) % 2**64
+        return {
+            "n": sum(p.n for p in self.parts),
+            "digest": digest,
+            "shards": [{"title": t, **p.watermark()} for t, p in zip(self.titles, self.parts)],
+        }
+
+    @property
+    def fingerprint(self) -> str:
+        return fingerprint(self.watermark())
+
+    def restore(self, frame: pd.DataFrame, watermark: dict) -> None:
+        saved = watermark.get("shards", [])
+        if [s["title"] for s in saved] != self.titles[: len(saved)]:
+            return  # порядок шардов поменялся — перечитаем всё
+        with self._lock:
+            labels = frame.index.to_numpy()
+            for i, (part, wm) in enumerate(zip(self.parts, saved)):
+                mine = (labels >= i * SHARD_STRIDE) & (labels < (i + 1) * SHARD_STRIDE)
+                part.restore(frame[mine], wm)
+            self.frame = self.delta = frame
+            self.reloaded = True
+            # пока процесс стоял, в прежний активный шард могли дописать строки,
+            # а затем завести новый: каждый восстановленный закрытый шард
+            # дочитывается один раз
+            self._sealing = [p for p in self.parts[: len(saved)] if p is not self.parts[-1]]
+
+    def refresh(self) -> pd.DataFrame:
+        with self._lock:
+            active = self.parts[-1]
+            pending = [p for p in self.parts[:-1] if p.frame is None or p in self._sealing] + [active]
+            fresh = {id(p) for p in pending if p.frame is None}
+            list(self._pool.map(IncrementalSheet.refresh, pending))
+            self._sealing = []
+            # шард, уже бывший в кадре, перечитан целиком — собираем кадр заново
+            if self.frame is None or any(p.reloaded and id(p) not in fresh for p in pending):
+                self.frame = self.delta = concat([p.frame for p in self.parts])
+                self.reloaded = True
+                return self.frame
+            self.reloaded = False
+            deltas = [p.delta for p in pending if len(p.delta)]
+            if not deltas:
+                self.delta = self.frame.iloc[:0]
+                return self.frame
+            self.delta = concat(deltas)
+            self.frame = append(self.frame, self.delta)
+            return self.frame
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import gspread
+import pandas as pd
+from google.auth.transport.requests import AuthorizedSession
+from gspread.exceptions import APIError
+from gspread.utils import convert_credentials
+from oauth2client.service_account import ServiceAccountCredentials
+from requests.adapters import HTTPAdapter
+
+from study.metrics import METRICS
+from study.sheets import ShardedSheet, fingerprint, parse_stage1, parse_stage2
+from study.store import SnapshotStore
+
+log = logging.getLogger(__name__)
+
+BOOK = "human_study_results"
+STAGE2_SHEET = "stage2_log"
+# шарды журнала: базовый лист, затем листы «<префикс>_<ключ>» (месяц, номер) по порядку ключей
+SHARD_PREFIX = {"stage1": "stage1", "stage2": STAGE2_SHEET}
+PARSERS = {"stage1": parse_stage1, "stage2": parse_stage2}
+SCOPES = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+POOL_SIZE = 4
+
+_clients: dict[str, gspread.Client] = {}
+_clients_lock = threading.Lock()
+
+
+def client(info: dict) -> gspread.Client:
+    """Один клиент на сервисный аккаунт на весь процесс.
+
+    Токен и пул HTTP-соединений общие для всех потоков, так что листы можно
+    читать параллельно без повторной авторизации.
+    """
+    key = info.get("client_email", "")
+    with _clients_lock:
+        gc = _clients.get(key)
+        if gc is None:
+            creds = ServiceAccountCredentials.from_json_keyfile_dict(info, SCOPES)
+            session = AuthorizedSession(convert_credentials(creds))
+            session.mount("https://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+            gc = _clients[key] = gspread.authorize(None, session=session)
+        return gc
+
+
+def open_book(info: dict, title: str = BOOK):
+    return client(info).open(title)
+
+
+def _natural(key: str) -> list:
+    # «2025-10» после «2025-9», «10» после «9»
+    return [(0, int(p), "") if p.isdigit() else (1, 0, p) for p in re.split(r"(\d+)", key) if p]
+
+
+def shards(worksheets: list, stage: str) -> list:
+    """Листы этапа по порядку: базовый (первый лист или ``stage2_log``) и его шарды."""
+    base = worksheets[0] if stage == "stage1" else next(
+        (ws for ws in worksheets if ws.title == STAGE2_SHEET), None
+    )
+    pattern = re.compile(rf"^{re.escape(SHARD_PREFIX[stage])}_(?P<key>.+)$")
+    found = [(m["key"], ws) for ws in worksheets if ws is not base and (m := pattern.match(ws.title))]
+    return ([base] if base is not None else []) + [ws for _, ws in sorted(found, key=lambda kv: _natural(kv[0]))]
+
+
+class StudySource:
+    """Оба листа исследования с дочитыванием и локальными снимками.
+
+    Таблица открывается лениво, при первом ``refresh()``, поэтому
+    ``restore()`` отдаёт сохранённые кадры без обращения к сети.
+
+    Если таблица сообщает время последней правки и оно не сдвинулось, листы
+    не запрашиваются вовсе; раз в ``verify_every`` опросов они всё равно
+    сверяются, на случай если метаданные отстают от содержимого.
+
+    Листы дочитываются параллельно, поэтому холодная загрузка занимает
+    примерно столько, сколько самый медленный из них. ``stages`` ограничивает
+    набор листов, например одним этапом на процесс воркера.
+
+    Этап может быть разбит на шарды (см. ``shards()``); список листов
+    перечитывается при каждом настоящем опросе, и новый шард становится
+    активным, а прежний закрывается.
+    """
+
+    def __init__(
+        self,
+        open_book: Callable[[], object],
+        store: SnapshotStore | None = None,
+        verify_every: int = 10,
+        stages: tuple[str, ...] = ("stage1", "stage2"),
+    ):
+        self._open_book = open_book
+        self.stages = stages
+        self.store = store
+        self.verify_every = verify_every
+        self.sheets: dict[str, ShardedSheet] = {}
+        self._book = None
+        self._revision: str | None = None
+        self._since_verify = 0
+        self._saved: dict[str, tuple[pd.DataFrame, dict]] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="study-sheet")
+
+    def version(self) -> str:
+        """Версия данных: отпечатки обоих листов (или сохранённых снимков до первого опроса)."""
+        if self.sheets:
+            parts = [sheet.fingerprint for sheet in self.sheets.values()]
+        else:
+            parts = [fingerprint(watermark) for _, watermark in self._saved.values()]
+        return ".".join(parts)
+
+    def restore(self) -> dict[str, pd.DataFrame] | None:
+        if self.store is None:
+            return None
+        saved = {name: self.store.load(name) for name in self.stages}
+        if any(v is None for v in saved.values()):
+            return None
+        self._saved = saved
+        return {name: frame for name, (frame, _) in saved.items()}
+
+    def refresh(self) -> bool:
+        """Сверяет листы с таблицей; ``True``, если версия данных изменилась."""
+        with self._lock:
+            if not self.sheets:
+                before = self.version() if self._saved else None
+                self._open()
+            else:
+                before = self.version()
+                if self._unchanged():
+                    return False
+                self._discover()
+            # list() дожидается обоих листов и пробрасывает первую ошибку
+            try:
+                list(self._pool.map(self._refresh_sheet, self.sheets.items()))
+            except Exception:
+                # опрос не закончен: следующий сверит листы, даже если время правки не сдвинулось
+                self._revision = None
+                raise
+            return self.version() != before
+
+    def _refresh_sheet(self, item: tuple[str, ShardedSheet]) -> None:
+        name, sheet = item
+        sheet.refresh()
+        if self.store is None or not (sheet.reloaded or len(sheet.delta)):
+            return
+        try:
+            # новые строки дописываются к снимку, целиком он пишется после перезагрузки листа
+            if sheet.reloaded:
+                self.store.save(name, sheet.frame, sheet.watermark())
+            else:
+                self.store.append(name, sheet.delta, sheet.frame, sheet.watermark())
+        except OSError:
+            log.exception("не удалось сохранить снимок %s", name)
+
+    def _unchanged(self) -> bool:
+        # дешёвая проверка по времени правки таблицы, если клиент его отдаёт
+        last_update = getattr(self._book, "get_lastUpdateTime", None)
+        if last_update is None:
+            return False
+        try:
+            revision = last_update()
+        except APIError:
+            return False
+        self._since_verify += 1
+        unchanged = revision == self._revision and self._since_verify < self.verify_every
+        METRICS.count("source.revision", unchanged)
+        if not unchanged:
+            self._revision, self._since_verify = revision, 0
+        return unchanged
+
+    def _open(self) -> None:
+        self._book = book = self._open_book()
+        # один запрос метаданных вместо отдельных sheet1 и worksheet()
+        worksheets = book.worksheets()
+        self.sheets = {name: self._sheet(name, shards(worksheets, name)) for name in self.stages}
+        for name, (frame, watermark) in self._saved.items():
+            self.sheets[name].restore(frame, watermark)
+        self._saved = {}
+
+    def _sheet(self, name: str, found: list) -> ShardedSheet:
+        if not found:
+            raise LookupError(f"в таблице нет листа для {name}")
+        return ShardedSheet(found, PARSERS[name], name)
+
+    def _discover(self) -> None:
+        # новые шарды дописываются в конец; если прежние пропали или сменили
+        # порядок, этап собирается заново
+        worksheets = self._book.worksheets()
+        for name, sheet in self.sheets.items():
+            found = shards(worksheets, name)
+            if [ws.title for ws in found[: len(sheet.parts)]] != sheet.titles:
+                sheet.close()
+                self.sheets[name] = self._sheet(name, found)
+            elif len(found) > len(sheet.parts):
+                sheet.extend(found)
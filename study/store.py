@@ -0,0 +1,172 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+from study.schema import concat
+
+log = logging.getLogger(__name__)
+
+# увеличивать при любом изменении состава или типов сохраняемых колонок
+SCHEMA_VERSION = 6
+
+
+class SnapshotStore:
+    """Локальные снимки разобранных листов в формате Arrow IPC.
+
+    Полный кадр лежит в ``<имя>.arrow``, а строки, дочитанные после него, —
+    отдельными файлами в ``<имя>.delta/``: опрос с новыми строками пишет на
+    диск только их. Полная перезагрузка листа или ``compact_every`` дельт
+    подряд снова сводят снимок в один файл. Вместе с кадром сохраняется
+    водяной знак загрузчика, чтобы дочитывание продолжилось с того же места.
+
+    Файлы пишутся без сжатия и читаются через отображение в память, но кадр
+    pandas из них собирается копированием: тёплый старт экономит запросы к
+    Google Sheets и разбор строк, а не чтение с диска.
+    """
+
+    def __init__(self, root: str | os.PathLike, compact_every: int = 50):
+        self.root = Path(root)
+        self.compact_every = compact_every
+        self._bases: dict[str, str] = {}
+        self._dirty: set[str] = set()
+
+    def path(self, name: str) -> Path:
+        return self.root / f"{name}.arrow"
+
+    def deltas(self, name: str) -> Path:
+        return self.root / f"{name}.delta"
+
+    def save(self, name: str, frame: pd.DataFrame, watermark: dict) -> None:
+        # метка полного снимка: дельты от прежнего снимка, если их не успели
+        # удалить, при чтении отбрасываются
+        base = uuid.uuid4().hex
+        self.root.mkdir(parents=True, exist_ok=True)
+        try:
+            self._write(self.path(name), frame, watermark, base)
+        except OSError:
+            # прежний снимок устарел: дельты к нему дописывать нельзя
+            self._dirty.add(name)
+            raise
+        self._bases[name] = base
+        self._dirty.discard(name)
+        shutil.rmtree(self.deltas(name), ignore_errors=True)
+
+    def append(self, name: str, delta: pd.DataFrame, frame: pd.DataFrame, watermark: dict) -> None:
+        """Дописывает новые строки; ``frame`` нужен, если пора свести снимок заново."""
+        folder = self.deltas(name)
+        files = sorted(folder.glob("*.arrow")) if folder.exists() else []
+        base = self._bases.get(name) or self._base(name)
+        if base is None or name in self._dirty or len(files) >= self.compact_every:
+            self.save(name, frame, watermark)
+            return
+        folder.mkdir(parents=True, exist_ok=True)
+        seq = int(files[-1].stem) + 1 if files else 1
+        try:
+            self._write(folder / f"{seq:06d}.arrow", delta, watermark, base)
+        except OSError:
+            # без этой дельты следующие давали бы дыру — в следующий раз пишем целиком
+            self._dirty.add(name)
+            raise
+
+    def load(self, name: str) -> tuple[pd.DataFrame, dict] | None:
+        loaded = self._read(self.path(name))
+        if loaded is None:
+            return None
+        table, meta = loaded
+        frames, watermark = [table.to_pandas()], json.loads(meta[b"watermark"])
+        folder = self.deltas(name)
+        for path in sorted(folder.glob("*.arrow")) if folder.exists() else []:
+            part = self._read(path)
+            if part is None or part[1].get(b"base") != meta.get(b"base"):
+                break
+            frames.append(part[0].to_pandas())
+            watermark = json.loads(part[1][b"watermark"])
+        return concat(frames), watermark
+
+    def _base(self, name: str) -> str | None:
+        try:
+            with pa.memory_map(str(self.path(name)), "r") as source:
+                meta = pa.ipc.open_file(source).schema.metadata or {}
+        except (OSError, pa.ArrowInvalid):
+            return None
+        base = meta.get(b"base")
+        return base.decode() if base else None
+
+    def _write(self, path: Path, frame: pd.DataFrame, watermark: dict, base: str) -> None:
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+        meta = dict(table.schema.metadata or {})
+        meta[b"schema_version"] = str(SCHEMA_VERSION).encode()
+        meta[b"watermark"] = json.dumps(watermark, ensure_ascii=False).encode()
+        meta[b"base"] = base.encode()
+        table = table.replace_schema_metadata(meta)
+        tmp = path.with_suffix(".tmp")
+        with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+    def _read(self, path: Path) -> tuple[pa.Table, dict] | None:
+        if not path.exists():
+            return None
+        try:
+            with pa.memory_map(str(path), "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+        except (OSError, pa.ArrowInvalid):
+            log.warning("снимок %s повреждён, игнорирую", path)
+            return None
+        meta = table.schema.metadata or {}
+        if meta.get(b"schema_version") != str(SCHEMA_VERSION).encode():
+            return None
+        return table, meta
+
+
+class ArtifactStore:
+    """Версионированные результаты воркера: ``<root>/<этап>/<версия>/*.arrow``.
+
+    Версия сначала пишется целиком в свой каталог, затем файл ``CURRENT``
+    атомарно переключается на неё; читатель всегда видит законченный набор.
+    Хранятся ``keep`` последних версий, чтобы не удалить ту, что сейчас читают.
+    """
+
+    def __init__(self, root: str | os.PathLike, keep: int = 3):
+        self.root, self.keep = Path(root), keep
+
+    def current(self, stage: str) -> str | None:
+        try:
+            return (self.root / stage / "CURRENT").read_text(encoding="utf-8").strip() or None
+        except OSError:
+            return None
+
+    def write(self, stage: str, version: str, frames: dict[str, pd.DataFrame]) -> None:
+        base = self.root / stage
+        store = SnapshotStore(base / version)
+        for name, frame in frames.items():
+            store.save(name, frame, {"version": version})
+        tmp = base / "CURRENT.tmp"
+        tmp.write_text(version, encoding="utf-8")
+        os.replace(tmp, base / "CURRENT")
+        self._prune(base, version)
+
+    def read(self, stage: str, version: str) -> dict[str, pd.DataFrame] | None:
+        store = SnapshotStore(self.root / stage / version)
+        frames = {}
+        for path in sorted(store.root.glob("*.arrow")):
+            loaded = store.load(path.stem)
+            if loaded is None:
+                return None
+            frames[path.stem] = loaded[0]
+        return frames or None
+
+    def _prune(self, base: Path, version: str) -> None:
+        dirs = sorted(
+            (d for d in base.iterdir() if d.is_dir() and d.name != version),
+            key=lambda d: d.stat().st_mtime,
+        )
+        for d in dirs[: max(len(dirs) - (self.keep - 1), 0)]:
+            shutil.rmtree(d, ignore_errors=True)
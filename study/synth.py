@@ -0,0 +1,215 @@
+from __future__ import annotations
+import re
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from study.sheets import STAGE1_COLS
+from study.source import STAGE2_SHEET
+
+STAGE2_COLS = ["timestamp", "user", "qnum", "alg", "qtype", "group", "answer", "is_correct", "time_ms"]
+# алгоритм -> доля показов
+ALGORITHMS = {
+    "socolov_lab_result": 0.3,
+    "socolov_rgb_result": 0.3,
+    "baseline_result": 0.2,
+    "noise_result": 0.2,
+}
+START = datetime(2025, 7, 1)
+
+
+def _answers(rng: np.random.Generator, n: int, truth: np.ndarray, accuracy: np.ndarray, dont_know: float):
+    # ответ совпадает с правильным с вероятностью accuracy, иначе — противоположный
+    # или «затрудняюсь»; is_correct пишется так же, как в реальном логе
+    dont = rng.random(n) < dont_know
+    correct = ~dont & (rng.random(n) < accuracy)
+    other = np.where(truth == "да", "нет", "да")
+    answer = np.where(dont, "Затрудняюсь ответить", np.where(correct, truth, other))
+    return answer, np.where(correct, "TRUE", "FALSE")
+
+
+def _layout(rng: np.random.Generator, users: int, required: int, dropout: float, days: int):
+    # сколько ответов дал каждый пользователь и когда начал
+    counts = np.full(users, required)
+    quit_ = rng.random(users) < dropout
+    counts[quit_] = rng.integers(1, required, quit_.sum())
+    user = np.repeat(np.arange(users), counts)
+    qnum = np.arange(len(user)) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+    start = rng.integers(0, days * 86_400, users)
+    return user, qnum, start
+
+
+def _clock(user: np.ndarray, start: np.ndarray, time_ms: np.ndarray) -> list[str]:
+    # время ответа = начало сессии + накопленное время на предыдущие вопросы
+    t = time_ms // 1000
+    elapsed = np.cumsum(t)
+    first = np.r_[True, user[1:] != user[:-1]]
+    head = np.maximum.accumulate(np.where(first, np.arange(len(user)), 0))
+    seconds = start[user] + elapsed - (elapsed - t)[head]
+    ts = np.datetime64(START, "s") + seconds.astype("timedelta64[s]")
+    return np.char.replace(np.datetime_as_string(ts, unit="s"), "T", " ").tolist()
+
+
+def _pick(rng: np.random.Generator, mix: dict[str, float], n: int) -> np.ndarray:
+    names = np.array(list(mix), dtype=object)
+    p = np.array(list(mix.values()), dtype="float64")
+    return names[rng.choice(len(names), n, p=p / p.sum())]
+
+
+def stage1_rows(
+    users: int,
+    algorithms: dict[str, float] = ALGORITHMS,
+    dont_know: float = 0.1,
+    required: int = 40,
+    dropout: float = 0.1,
+    images: int = 50,
+    days: int = 30,
+    seed: int = 0,
+) -> list[list[str]]:
+    """Строки первого этапа в том виде, в каком их отдаёт ``get_all_values()``, с заголовком."""
+    rng = np.random.default_rng(seed)
+    user, qnum, start = _layout(rng, users, required, dropout, days)
+    n = len(user)
+    alg = _pick(rng, algorithms, n)
+    accuracy = {a: 0.55 + 0.4 * rng.random() for a in algorithms}
+    kind = np.where(rng.random(n) < 0.5, "letters", "corners")
+    truth = np.where(rng.random(n) < 0.5, "да", "нет")
+    answer, correct = _answers(rng, n, truth, np.vectorize(accuracy.get)(alg), dont_know)
+    time_ms = rng.lognormal(8.5, 0.6, n).astype("int64")
+    cols = [
+        _clock(user, start, time_ms),
+        [f"user{u}" for u in user.tolist()],
+        qnum.astype(str).tolist(),
+        [f"img{i}" for i in rng.integers(1, images + 1, n).tolist()],
+        alg.tolist(),
+        kind.tolist(),
+        np.where(kind == "letters", "Видны ли буквы?", "Видны ли углы?").tolist(),
+        answer.tolist(),
+        truth.tolist(),
+        time_ms.astype(str).tolist(),
+        correct.tolist(),
+        [f"s{u}" for u in user.tolist()],
+    ]
+    return [list(STAGE1_COLS)] + [list(r) for r in zip(*cols)]
+
+
+def stage2_rows(
+    users: int,
+    algorithms: dict[str, float] = ALGORITHMS,
+    dont_know: float = 0.1,
+    required: int = 15,
+    dropout: float = 0.1,
+    groups: int = 5,
+    days: int = 30,
+    seed: int = 1,
+) -> list[list[str]]:
+    """Строки листа ``stage2_log`` с заголовком."""
+    rng = np.random.default_rng(seed)
+    user, qnum, start = _layout(rng, users, required, dropout, days)
+    n = len(user)
+    alg = _pick(rng, algorithms, n)
+    accuracy = {a: 0.55 + 0.4 * rng.random() for a in algorithms}
+    truth = np.where(rng.random(n) < 0.5, "да", "нет")
+    answer, correct = _answers(rng, n, truth, np.vectorize(accuracy.get)(alg), dont_know)
+    time_ms = rng.lognormal(8.0, 0.5, n).astype("int64")
+    cols = [
+        _clock(user, start, time_ms),
+        [f"v{u}" for u in user.tolist()],
+        qnum.astype(str).tolist(),
+        alg.tolist(),
+        np.where(rng.random(n) < 0.5, "letters", "corners").tolist(),
+        [f"g{g}" for g in rng.integers(1, groups + 1, n).tolist()],
+        answer.tolist(),
+        correct.tolist(),
+        time_ms.astype(str).tolist(),
+    ]
+    return [list(STAGE2_COLS)] + [list(r) for r in zip(*cols)]
+
+
+class FakeWorksheet:
+    """Лист в памяти с тем же интерфейсом чтения, что у ``gspread.Worksheet``.
+
+    ``latency`` — задержка каждого запроса в секундах, чтобы проверять
+    параллельную загрузку без сети.
+    """
+
+    def __init__(self, title: str, rows: list[list[str]], latency: float = 0.0, book: FakeBook | None = None):
+        self.title, self.rows, self.latency, self.book = title, rows, latency, book
+        self.calls = 0
+
+    def _request(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_all_values(self) -> list[list[str]]:
+        self._request()
+        return [list(r) for r in self.rows]
+
+    def get_values(self, range_name: str) -> list[list[str]]:
+        self._request()
+        first = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        return [list(r) for r in self.rows[first - 1:]]
+
+    def append_rows(self, rows: list[list[str]]) -> None:
+        self.rows.extend(list(r) for r in rows)
+        if self.book is not None:
+            self.book.touch()
+
+
+class FakeBook:
+    """Таблица из нескольких ``FakeWorksheet`` с временем последней правки."""
+
+    def __init__(self, sheets: dict[str, list[list[str]]], latency: float = 0.0):
+        self._sheets = [FakeWorksheet(t, rows, latency, self) for t, rows in sheets.items()]
+        self._revision = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        return self._sheets[0]
+
+    def worksheets(self) -> list[FakeWorksheet]:
+        return list(self._sheets)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        return next(ws for ws in self._sheets if ws.title == title)
+
+    def add_worksheet(self, title: str, rows: list[list[str]]) -> FakeWorksheet:
+        ws = FakeWorksheet(title, rows, self._sheets[0].latency if self._sheets else 0.0, self)
+        self._sheets.append(ws)
+        self.touch()
+        return ws
+
+    def touch(self) -> None:
+        with self._lock:
+            self._revision += 1
+
+    def get_lastUpdateTime(self) -> str:
+        return str(self._revision)
+
+
+def study_book(
+    users: int,
+    users2: int | None = None,
+    latency: float = 0.0,
+    seed: int = 0,
+    shards: int = 1,
+    **kwargs,
+) -> FakeBook:
+    """Таблица исследования с обоими листами.
+
+    При ``shards > 1`` ответы первого этапа делятся поровну между первым
+    листом и листами ``stage1_2`` … ``stage1_<shards>``.
+    ``kwargs`` (``algorithms``, ``dont_know``, ``dropout``, ``days``) уходят в оба генератора.
+    """
+    rows = stage1_rows(users, seed=seed, **kwargs)
+    header, body = rows[0], rows[1:]
+    size = -(-len(body) // shards) if body else 0
+    parts = [body[i * size: (i + 1) * size] for i in range(shards)]
+    sheets = {"Sheet1": [header] + parts[0]}
+    sheets.update({f"stage1_{i + 1}": [header] + part for i, part in enumerate(parts[1:], 1)})
+    sheets[STAGE2_SHEET] = stage2_rows(users if users2 is None else users2, seed=seed + 1, **kwargs)
+    return FakeBook(sheets, latency)
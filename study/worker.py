@@ -0,0 +1,165 @@
+"""Фоновый воркер: опрашивает таблицу и пишет готовые артефакты дашборда.
+
+Запуск::
+
+    python -m study.worker --out artifacts --key service_account.json
+    python -m study.worker --out artifacts --local data/   # stage1.csv и stage2_log.csv
+
+Каждый этап обрабатывается в своём процессе: дочитывание листа, фильтр
+завершивших, куб и первые показы. Результат пишется в ``ArtifactStore``;
+приложение с ``STUDY_ARTIFACT_DIR`` только читает его.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import json
+import logging
+import multiprocessing as mp
+import os
+import re
+import sys
+import time
+from functools import partial
+from pathlib import Path
+from typing import Callable
+
+from study.metrics import METRICS
+from study.pipeline import STAGES, StagePipeline
+from study.source import STAGE2_SHEET, StudySource, open_book
+from study.store import ArtifactStore, SnapshotStore
+
+log = logging.getLogger(__name__)
+
+# лист -> файл в каталоге локальной подмены
+LOCAL_FILES = {"Sheet1": "stage1.csv", STAGE2_SHEET: "stage2_log.csv"}
+
+
+class LocalWorksheet:
+    """CSV-файл с интерфейсом чтения ``gspread.Worksheet``."""
+
+    def __init__(self, title: str, path: Path):
+        self.title, self.path = title, path
+
+    def get_all_values(self) -> list[list[str]]:
+        if not self.path.exists():
+            return []
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            return [row for row in csv.reader(f)]
+
+    def get_values(self, range_name: str) -> list[list[str]]:
+        first = int(re.match(r"[A-Z]+(\d+)", range_name).group(1))
+        return self.get_all_values()[first - 1:]
+
+
+class LocalBook:
+    """Каталог CSV-файлов вместо таблицы; время правки — самый свежий mtime."""
+
+    def __init__(self, root: str | os.PathLike):
+        self.root = Path(root)
+        self._sheets = [LocalWorksheet(t, self.root / f) for t, f in LOCAL_FILES.items()]
+
+    @property
+    def sheet1(self) -> LocalWorksheet:
+        return self._sheets[0]
+
+    def worksheets(self) -> list[LocalWorksheet]:
+        return list(self._sheets)
+
+    def get_lastUpdateTime(self) -> str:
+        return str(max((ws.path.stat().st_mtime_ns for ws in self._sheets if ws.path.exists()), default=0))
+
+
+def step(name: str, source: StudySource, pipeline: StagePipeline, artifacts: ArtifactStore) -> str | None:
+    """Один проход этапа; возвращает записанную версию или ``None``.
+
+    Дельта листа применяется только в том опросе, где она пришла. Если
+    запись упала, следующий проход перепишет уже посчитанный результат, а
+    не применит ту же дельту второй раз.
+    """
+    try:
+        changed = source.refresh()
+        if changed or pipeline.stale:
+            pipeline.update(source.sheets[name])
+    except Exception:
+        pipeline.stale = True
+        raise
+    version = source.version()
+    if not changed and artifacts.current(name) == version:
+        return None
+    with METRICS.span(f"write.{name}"):
+        artifacts.write(name, version, pipeline.artifacts())
+    return version
+
+
+def run_stage(
+    name: str,
+    book: Callable[[], object],
+    out: str,
+    interval: float,
+    once: bool = False,
+    metrics_log: str | None = None,
+) -> None:
+    """Цикл одного этапа; запускается в отдельном процессе."""
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s {name} %(levelname)s %(message)s")
+    if metrics_log:
+        METRICS.log_to(f"{metrics_log}.{name}")
+    artifacts = ArtifactStore(out)
+    source = StudySource(book, SnapshotStore(Path(out) / "state"), stages=(name,))
+    pipeline = StagePipeline(STAGES[name])
+    saved = source.restore()
+    if saved is not None:
+        pipeline.reset(saved[name])
+    while True:
+        started = time.monotonic()
+        try:
+            version = step(name, source, pipeline, artifacts)
+            if version is not None:
+                log.info("записана версия %s", version)
+        except Exception:
+            log.exception("не удалось обработать %s", name)
+            if once:
+                raise
+        if once:
+            return
+        time.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--out", default=os.environ.get("STUDY_ARTIFACT_DIR", "artifacts"))
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--key", help="JSON-ключ сервисного аккаунта")
+    src.add_argument("--local", help="каталог с stage1.csv и stage2_log.csv")
+    ap.add_argument("--interval", type=float, default=30)
+    ap.add_argument("--once", action="store_true", help="один проход и выход")
+    ap.add_argument("--metrics-log", default=os.environ.get("STUDY_METRICS_LOG"))
+    args = ap.parse_args(argv)
+
+    if args.local:
+        book = partial(LocalBook, args.local)
+    else:
+        with open(args.key, encoding="utf-8") as f:
+            book = partial(open_book, json.load(f))
+    # spawn: дочерним процессам не достаются потоки и блокировки родителя
+    ctx = mp.get_context("spawn")
+    procs = [
+        ctx.Process(
+            target=run_stage,
+            args=(name, book, args.out, args.interval, args.once, args.metrics_log),
+            name=f"study-{name}",
+        )
+        for name in STAGES
+    ]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+    return max((p.exitcode or 0) for p in procs)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+"""Общие заготовки тестов: строки нового пользователя, свежие загрузки и сравнение кадров."""
+import pandas as pd
+
+from study import cube
+from study.pipeline import STAGES, StagePipeline
+from study.source import StudySource
+from study.synth import stage1_rows
+
+
+def tail(seed: int, name: str) -> list[list[str]]:
+    """Полный тест одного нового пользователя ``name`` первого этапа, без заголовка."""
+    return [[r[0], name, *r[2:]] for r in stage1_rows(1, seed=seed, dropout=0)[1:]]
+
+
+def broken(*args):
+    raise OSError("сбой")
+
+
+def same_frame(a: pd.DataFrame, b: pd.DataFrame, index: bool = True) -> None:
+    # словари категорий зависят от порядка загрузки, поэтому сравниваются значения
+    if not index:
+        a, b = a.reset_index(drop=True), b.reset_index(drop=True)
+    pd.testing.assert_frame_equal(a.astype(str), b.astype(str), check_categorical=False)
+
+
+def fresh_source(book, **kwargs) -> StudySource:
+    source = StudySource(lambda: book, **kwargs)
+    source.refresh()
+    return source
+
+
+def fresh_pipeline(source: StudySource, name: str = "stage1") -> StagePipeline:
+    pipe = StagePipeline(STAGES[name])
+    pipe.reset(source.sheets[name].frame)
+    return pipe
+
+
+def same_pipeline(a: StagePipeline, b: StagePipeline) -> None:
+    # порядок меток первых показов и ячеек куба зависит от порядка обновлений
+    x, y = a.artifacts(), b.artifacts()
+    assert x.keys() == y.keys()
+    for name in x:
+        left, right = x[name], y[name]
+        if name == "cube":
+            dims = [c for c in left.columns if c not in cube.MEASURES]
+            left, right = (c.astype(str).sort_values(dims) for c in (left, right))
+        elif name == "first":
+            left, right = (c.sort_values("label") for c in (left, right))
+        same_frame(left, right, index=False)
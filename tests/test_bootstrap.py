@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from study import bootstrap, cube
+from study.bootstrap import CI_COLUMNS, PAIR_COLUMNS
+from study.sheets import parse_stage1
+from study.synth import stage1_rows
+
+USER, ALG = "Пользователь", "Алгоритм"
+
+
+@pytest.fixture(scope="module")
+def df() -> pd.DataFrame:
+    rows = stage1_rows(40, seed=11)
+    return parse_stage1(rows[1:], 0, rows[0])
+
+
+def test_empty_sums():
+    empty = bootstrap.user_sums(pd.DataFrame({USER: [], ALG: [], "is_correct": [], "Время_сек": []}), USER, ALG)
+    res = bootstrap.bootstrap(empty, USER, ALG, n_boot=100)
+    assert res.ci.empty and list(res.ci.columns) == CI_COLUMNS
+    assert res.ci.index.name == ALG
+    assert res.pairs.empty and list(res.pairs.columns) == PAIR_COLUMNS
+
+
+def test_single_group_has_no_pairs(df):
+    one = df[df[ALG] == df[ALG].iloc[0]]
+    res = bootstrap.bootstrap(bootstrap.user_sums(one, USER, ALG), USER, ALG, n_boot=200)
+    assert len(res.ci) == 1
+    assert res.ci["users"].iloc[0] == one[USER].nunique()
+    assert res.pairs.empty and list(res.pairs.columns) == PAIR_COLUMNS
+
+
+def test_point_estimate_matches_rows(df):
+    res = bootstrap.bootstrap(bootstrap.user_sums(df, USER, ALG), USER, ALG, n_boot=500)
+    by = df.groupby(ALG, observed=True)
+    ci = res.ci.set_axis(res.ci.index.astype(str))
+    expected = pd.DataFrame({
+        "users": by[USER].nunique(),
+        "accuracy": by["is_correct"].mean(),
+        "mean_t": by["Время_сек"].mean(),
+    }).set_axis(by.size().index.astype(str)).loc[ci.index]
+    pd.testing.assert_frame_equal(ci[["users", "accuracy", "mean_t"]], expected, check_dtype=False, check_names=False)
+    assert ((ci["acc_lo"] <= ci["accuracy"]) & (ci["accuracy"] <= ci["acc_hi"])).all()
+    assert ((ci["t_lo"] <= ci["mean_t"]) & (ci["mean_t"] <= ci["t_hi"])).all()
+    # разница в паре — разница точечных оценок из таблицы ci
+    p = res.pairs
+    np.testing.assert_allclose(p["diff"], ci.loc[p["a"], "accuracy"].to_numpy() - ci.loc[p["b"], "accuracy"].to_numpy())
+    np.testing.assert_allclose(p["diff_t"], ci.loc[p["a"], "mean_t"].to_numpy() - ci.loc[p["b"], "mean_t"].to_numpy())
+
+
+def test_cell_sums_give_same_result(df):
+    from_rows = bootstrap.bootstrap(bootstrap.user_sums(df, USER, ALG), USER, ALG, n_boot=300)
+    cells = cube.build(df, cube.STAGE1_DIMS)
+    from_cube = bootstrap.bootstrap(bootstrap.cell_sums(cells, USER, ALG), USER, ALG, n_boot=300)
+    pd.testing.assert_frame_equal(from_rows.ci, from_cube.ci, check_index_type=False)
+    pd.testing.assert_frame_equal(from_rows.pairs, from_cube.pairs)
+
+
+def test_p_value_is_symmetric(df):
+    sums = bootstrap.user_sums(df, USER, ALG)
+    sums[ALG] = sums[ALG].astype(str)
+    names = sorted(sums[ALG].unique())[:2]
+    sums = sums[sums[ALG].isin(names)]
+    # переименование меняет порядок групп в паре: a и b меняются местами
+    swapped = sums.assign(**{ALG: sums[ALG].map({names[0]: "я", names[1]: names[1]})})
+    ab = bootstrap.bootstrap(sums, USER, ALG, n_boot=1000).pairs.iloc[0]
+    ba = bootstrap.bootstrap(swapped, USER, ALG, n_boot=1000).pairs.iloc[0]
+    assert (ab["a"], ba["a"]) == (names[0], names[1])
+    assert ab["p"] == pytest.approx(ba["p"]) and ab["p_t"] == pytest.approx(ba["p_t"])
+    assert ab["diff"] == pytest.approx(-ba["diff"])
+    assert (ab["lo"], ab["hi"]) == pytest.approx((-ba["hi"], -ba["lo"]))
+    d = np.random.default_rng(0).normal(0.1, 1, (500, 3))
+    np.testing.assert_allclose(bootstrap._p_value(d), bootstrap._p_value(-d))
@@ -0,0 +1,157 @@
+import time
+
+import pandas as pd
+
+from study import cube
+from study.completion import CompletionTracker
+from study.sheets import IncrementalSheet, parse_stage1, parse_stage2
+from study.source import STAGE2_SHEET
+from study.synth import STAGE2_COLS, FakeWorksheet, stage1_rows, stage2_rows
+
+from helpers import tail
+
+USER = "Пользователь"
+
+
+def _tracker_and_sheet(rows: list[list[str]]) -> tuple[CompletionTracker, IncrementalSheet, FakeWorksheet]:
+    ws = FakeWorksheet("Sheet1", rows)
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    done = CompletionTracker(USER, 40, cube.STAGE1_DIMS)
+    done.update(sheet)
+    return done, sheet, ws
+
+
+def _users(cells: pd.DataFrame) -> dict:
+    return cube.rollup(cells, USER)["n"].to_dict() if len(cells) else {}
+
+
+def _check(done: CompletionTracker, sheet: IncrementalSheet) -> None:
+    # инкрементальный результат совпадает с пересчётом с нуля
+    full = CompletionTracker(USER, 40, cube.STAGE1_DIMS)
+    full.reset(sheet.frame)
+    assert done.completed == full.completed
+    assert list(done.frame.index) == list(full.frame.index)
+    assert _users(done.cube) == _users(full.cube)
+    dims = cube.STAGE1_DIMS
+    pd.testing.assert_frame_equal(
+        done.cube.astype({d: str for d in dims}).sort_values(dims, ignore_index=True),
+        full.cube.astype({d: str for d in dims}).sort_values(dims, ignore_index=True),
+    )
+
+
+def test_promotion_when_count_reaches_required():
+    rows = stage1_rows(3, seed=1, dropout=0)
+    # у последнего пользователя пока нет одного ответа
+    done, sheet, ws = _tracker_and_sheet(rows[:-1])
+    last = rows[-1][1]
+    assert last not in done.completed
+    assert len(done.completed) == 2
+
+    ws.append_rows([rows[-1]])
+    sheet.refresh()
+    done.update(sheet)
+    assert not sheet.reloaded
+    assert last in done.completed
+    assert (done.frame[USER] == last).sum() == 40
+    _check(done, sheet)
+
+
+def test_demotion_when_count_exceeds_required():
+    rows = stage1_rows(3, seed=2, dropout=0)
+    done, sheet, ws = _tracker_and_sheet(rows)
+    user = rows[1][1]
+    assert user in done.completed
+
+    ws.append_rows([rows[1]])
+    sheet.refresh()
+    done.update(sheet)
+    assert user not in done.completed
+    assert not (done.frame[USER] == user).any()
+    assert user not in _users(done.cube)
+    _check(done, sheet)
+
+
+def test_unfinished_users_stay_out():
+    rows = stage1_rows(20, seed=3, dropout=0.5)
+    done, sheet, _ = _tracker_and_sheet(rows)
+    counts = sheet.frame[USER].value_counts()
+    assert done.completed == set(counts[counts == 40].index)
+    _check(done, sheet)
+
+
+def test_header_only_sheet_picks_up_first_rows():
+    rows = stage2_rows(3, seed=4, dropout=0)
+    ws = FakeWorksheet(STAGE2_SHEET, rows[:1])
+    sheet = IncrementalSheet(ws, parse_stage2)
+    sheet.refresh()
+    assert list(sheet.frame.columns[: len(STAGE2_COLS)]) == STAGE2_COLS
+    done = CompletionTracker("user", 15, cube.STAGE2_DIMS)
+    done.update(sheet)
+
+    ws.append_rows(rows[1:])
+    sheet.refresh()
+    assert not sheet.reloaded
+    done.update(sheet)
+    assert len(done.completed) == 3
+    assert len(done.frame) == 45
+    assert int(cube.total(done.cube)["n"]) == 45
+
+
+def test_empty_stage2_parses_with_header_columns():
+    df = parse_stage2([STAGE2_COLS], 0, STAGE2_COLS)
+    assert df.empty
+    assert "user" in df.columns and "date" in df.columns
+
+
+def test_promoted_rows_are_inserted_in_label_order():
+    # первый пользователь дописывает последний ответ после полного теста второго
+    a, b = tail(1, "a"), tail(2, "b")
+    done, sheet, ws = _tracker_and_sheet([stage1_rows(1, seed=0)[0]] + a[:-1] + b)
+    assert done.completed == {"b"}
+    ws.append_rows(a[-1:])
+    sheet.refresh()
+    done.update(sheet)
+    assert done.completed == {"a", "b"}
+    assert done.frame.index.is_monotonic_increasing
+    _check(done, sheet)
+
+
+def test_promotion_and_demotion_between_reads():
+    rows = stage1_rows(2, seed=6, dropout=0)
+    done, sheet, ws = _tracker_and_sheet(rows)
+    stays = done.completed - {rows[1][1]}
+    for step in (tail(3, "c"), tail(3, "c")[:1], [rows[1]]):
+        ws.append_rows(step)
+        sheet.refresh()
+        done.update(sheet)
+    # «c» завершил и тут же вышел, первый пользователь вышел — кадр ещё не читался
+    assert done.completed == stays and len(stays) == 1
+    _check(done, sheet)
+
+
+def _update_cost(users: int, built: list[int], repeat: int = 5) -> float:
+    done, sheet, ws = _tracker_and_sheet(stage1_rows(users, seed=7))
+    done.frame, done.cube
+    best = float("inf")
+    for k in range(repeat):
+        ws.append_rows(tail(k, f"new{k}"))
+        sheet.refresh()
+        built.clear()
+        started = time.perf_counter()
+        done.update(sheet)
+        best = min(best, time.perf_counter() - started)
+        # куб достраивается только по строкам нового пользователя
+        assert built == [40]
+    _check(done, sheet)
+    return best
+
+
+def test_update_cost_does_not_grow_with_history(monkeypatch):
+    built: list[int] = []
+    build = cube.build
+    monkeypatch.setattr(cube, "build", lambda df, dims: built.append(len(df)) or build(df, dims))
+    small = _update_cost(200, built)
+    large = _update_cost(4000, built)
+    # в 20 раз больше истории; полный пересчёт рос бы пропорционально
+    assert large < 2 * small + 0.005
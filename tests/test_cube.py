@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from study import cube
+from study.sheets import parse_stage1, parse_stage2
+from study.synth import stage1_rows, stage2_rows
+
+
+def _stage1() -> pd.DataFrame:
+    rows = stage1_rows(30, seed=5)
+    return parse_stage1(rows[1:], 0, rows[0])
+
+
+def _stage2() -> pd.DataFrame:
+    rows = stage2_rows(60, seed=5)
+    return parse_stage2(rows[1:], 0, rows[0])
+
+
+def _old_summary(df: pd.DataFrame, by: str, answer: str) -> pd.DataFrame:
+    # прежняя таблица дашборда: groupby().agg() по строкам
+    out = (
+        df.groupby(by, observed=True)
+        .agg(
+            Ответов=("qnum", "count"),
+            Точность=("is_correct", "mean"),
+            Ср_время=("Время_сек", "mean"),
+            Затрудняюсь=(answer, lambda s: s.astype(str).str.lower().str.startswith("затруд").sum()),
+        )
+        .reset_index()
+    )
+    out["Точность"] = (out["Точность"] * 100).round(1)
+    out["Ср_время"] = out["Ср_время"].round(2)
+    return out
+
+
+def _summary(cells: pd.DataFrame, by: str) -> pd.DataFrame:
+    r = cube.rollup(cells, by)
+    return pd.DataFrame({
+        "Ответов": r["n"],
+        "Точность": (r["accuracy"] * 100).round(1),
+        "Ср_время": r["mean_t"].round(2),
+        "Затрудняюсь": r["dont"],
+    }).reset_index()
+
+
+def _same(new: pd.DataFrame, old: pd.DataFrame, by: str) -> None:
+    new = new.assign(**{by: new[by].astype(str)}).sort_values(by, ignore_index=True)
+    old = old.assign(**{by: old[by].astype(str)}).sort_values(by, ignore_index=True)
+    pd.testing.assert_frame_equal(new, old, check_dtype=False)
+
+
+@pytest.mark.parametrize("by", ["Пользователь", "Алгоритм", "image_id"])
+def test_stage1_rollups_match_groupby(by):
+    df = _stage1()
+    _same(_summary(cube.build(df, cube.STAGE1_DIMS), by), _old_summary(df, by, "Ответ"), by)
+
+
+def test_question_filter_is_served_from_cube():
+    df = _stage1()
+    full = cube.build(df, cube.STAGE1_DIMS)
+    filters = {"Вопрос": ["Видны ли углы?"], "Алгоритм": []}
+    assert cube.covers(full, filters)
+    cells = cube.restrict(full, filters)
+    part = df[df["Вопрос"].isin(filters["Вопрос"])]
+    for by in ["Пользователь", "Алгоритм", "image_id"]:
+        _same(_summary(cells, by), _old_summary(part, by, "Ответ"), by)
+
+
+def test_stage2_rollups_match_groupby():
+    df = _stage2()
+    cells = cube.build(df, cube.STAGE2_DIMS)
+    _same(
+        _summary(cells, "group").rename(columns={"group": "Изображение"}),
+        _old_summary(df, "group", "answer").rename(columns={"group": "Изображение"}),
+        "Изображение",
+    )
+
+    corners = df[df["qtype"] == "corners"]
+    answer = corners["answer"].astype(str).str.lower().str.strip()
+    wrong = ~corners["is_correct"]
+    old = (
+        corners.assign(
+            inc_zat=wrong & answer.str.startswith("затруд"),
+            inc_no=wrong & (answer == "нет"),
+            inc_yes=wrong & answer.isin(["да", "yes", "y"]),
+        )
+        .groupby("alg", observed=True)
+        .agg(
+            Всего=("qnum", "count"),
+            Правильных=("is_correct", "sum"),
+            Ошибочных=("is_correct", lambda s: (~s).sum()),
+            Ошибка_Нет=("inc_no", "sum"),
+            Ошибка_Да=("inc_yes", "sum"),
+            Ошибка_Затрудняюсь=("inc_zat", "sum"),
+        )
+        .assign(Точность=lambda x: (x["Правильных"] / x["Всего"] * 100).round(1))
+    )
+    r = cube.rollup(cells[cells["qtype"] == "corners"], "alg")
+    new = pd.DataFrame({
+        "Всего": r["n"],
+        "Правильных": r["correct"],
+        "Ошибочных": r["n"] - r["correct"],
+        "Ошибка_Нет": r["err_no"],
+        "Ошибка_Да": r["err_yes"],
+        "Ошибка_Затрудняюсь": r["err_dont"],
+        "Точность": (r["accuracy"] * 100).round(1),
+    })
+    _same(new.reset_index(), old.reset_index(), "alg")
+    assert np.all(new["Ошибка_Нет"] + new["Ошибка_Да"] + new["Ошибка_Затрудняюсь"] <= new["Ошибочных"])
@@ -0,0 +1,47 @@
+import numpy as np
+
+from study.exposure import FirstExposure
+from study.sheets import IncrementalSheet, parse_stage1
+from study.synth import FakeWorksheet, stage1_rows
+
+KEYS = ["Пользователь", "image_id"]
+
+
+def _expected(df) -> np.ndarray:
+    # прежний расчёт: сортировка по времени и первая строка в каждой паре
+    first = df[df["Тип"] == "letters"].sort_values("timestamp", kind="stable").drop_duplicates(KEYS)
+    return np.sort(first.index.to_numpy())
+
+
+def test_incremental_matches_sort_and_dedup():
+    rows = stage1_rows(30, seed=4)
+    ws = FakeWorksheet("Sheet1", rows[:200])
+    sheet = IncrementalSheet(ws, parse_stage1, full_every=100)
+    first = FirstExposure(KEYS, "Тип", "letters")
+    sheet.refresh()
+    first.update(sheet)
+    for lo in range(200, len(rows), 150):
+        ws.append_rows(rows[lo: lo + 150])
+        sheet.refresh()
+        assert not sheet.reloaded
+        first.update(sheet)
+        np.testing.assert_array_equal(np.sort(first.labels()), _expected(sheet.frame))
+
+
+def test_earlier_row_in_later_delta_wins():
+    rows = stage1_rows(2, seed=5, dropout=0)
+    letters = [r for r in rows[1:] if r[5] == "letters"]
+    late = list(letters[0])
+    # тот же показ, но с более ранним временем приходит отдельной строкой позже
+    late[0] = "2000-01-01 00:00:00"
+    ws = FakeWorksheet("Sheet1", rows)
+    sheet = IncrementalSheet(ws, parse_stage1)
+    first = FirstExposure(KEYS, "Тип", "letters")
+    sheet.refresh()
+    first.update(sheet)
+    label = len(ws.rows)
+    ws.append_rows([late])
+    sheet.refresh()
+    first.update(sheet)
+    assert label in set(first.labels())
+    np.testing.assert_array_equal(np.sort(first.labels()), _expected(sheet.frame))
@@ -0,0 +1,72 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from study.filters import FilterIndex
+from study.sheets import parse_stage2
+from study.synth import STAGE2_COLS, stage2_rows
+
+COLUMNS = ["user", "alg", "qtype", "group"]
+
+
+def _frame(broken_times: int = 0, users: int = 40) -> pd.DataFrame:
+    rows = stage2_rows(users, seed=3)
+    # разбор второго этапа сохраняет строки с неразборчивым временем как NaT
+    for r in rows[1: broken_times + 1]:
+        r[0] = "не время"
+    return parse_stage2(rows, 0, rows[0])
+
+
+def _expected(df: pd.DataFrame, filters: dict, d_from: date, d_to: date) -> np.ndarray:
+    # прежний расчёт: isin по каждой колонке и сравнение дат
+    mask = pd.Series(True, index=df.index)
+    for col, chosen in filters.items():
+        if chosen:
+            mask &= df[col].isin(chosen)
+    mask &= (df["date"] >= pd.Timestamp(d_from)) & (df["date"] <= pd.Timestamp(d_to))
+    return np.flatnonzero(mask.to_numpy())
+
+
+def test_date_range_skips_nat():
+    df = _frame(broken_times=25)
+    assert df["date"].isna().sum() == 25
+    lo, hi = FilterIndex(df, COLUMNS).date_range()
+    assert (lo, hi) == (df["date"].min().date(), df["date"].max().date())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_select_matches_isin_mask(seed):
+    df = _frame(broken_times=25)
+    index = FilterIndex(df, COLUMNS)
+    rng = np.random.default_rng(seed)
+    filters = {
+        col: list(rng.choice(index.values(col), rng.integers(0, 3), replace=False)) for col in COLUMNS
+    }
+    filters["alg"].append("нет такого алгоритма")
+    lo, hi = index.date_range()
+    days = pd.date_range(lo, hi).date
+    d_from, d_to = sorted(rng.choice(days, 2))
+    np.testing.assert_array_equal(index.select(filters, d_from, d_to), _expected(df, filters, d_from, d_to))
+    # без фильтров и на весь диапазон — все строки с датой
+    np.testing.assert_array_equal(
+        index.select({c: [] for c in COLUMNS}, lo, hi), np.flatnonzero(df["date"].notna().to_numpy())
+    )
+
+
+def test_all_nat_frame():
+    df = _frame(broken_times=200, users=2)
+    assert df["date"].isna().all()
+    index = FilterIndex(df, COLUMNS)
+    lo, hi = index.date_range()
+    assert lo == hi
+    assert len(index.select({}, lo, hi)) == 0
+
+
+def test_empty_frame():
+    df = parse_stage2([STAGE2_COLS], 0, STAGE2_COLS)
+    index = FilterIndex(df, COLUMNS)
+    lo, hi = index.date_range()
+    assert index.values("user") == []
+    assert len(index.select({"user": ["x"]}, lo, hi)) == 0
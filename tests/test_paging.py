@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from study import paging
+
+
+def _frame() -> pd.DataFrame:
+    # словарь категорий не отсортирован, как после дочитывания листа
+    alg = pd.Categorical(["b", "a", None, "c", "a", "b"], categories=["c", "a", "b"])
+    return pd.DataFrame({
+        "alg": alg,
+        "time": [3.0, np.nan, 1.0, 2.0, 5.0, np.nan],
+        "note": ["Да", "нет", None, "ДАЛЕЕ", "", "да"],
+        "n": [1, 2, 3, 4, 5, 6],
+    })
+
+
+def _expected(df: pd.DataFrame, by: str, descending: bool) -> list[int]:
+    # пропуски всегда в конце, равные значения — в исходном порядке
+    s = df[by].astype(object).where(df[by].notna())
+    valid = [i for i in range(len(df)) if s[i] is not None and s[i] == s[i]]
+    # sort(reverse=True) тоже оставляет равные в исходном порядке
+    valid.sort(key=lambda i: s[i], reverse=descending)
+    return valid + [i for i in range(len(df)) if i not in valid]
+
+
+def test_order_puts_missing_last():
+    df = _frame()
+    for by in ["alg", "time", "note", "n"]:
+        for desc in (False, True):
+            assert list(paging.order(df, by, desc)) == _expected(df, by, desc), (by, desc)
+
+
+def test_descending_keeps_ties_stable():
+    df = _frame()
+    assert list(paging.order(df, "alg", descending=True)) == [3, 0, 5, 1, 4, 2]
+    assert list(paging.order(df, "alg")) == [1, 4, 0, 5, 3, 2]
+
+
+def test_order_without_sort_keeps_rows():
+    df = _frame()
+    assert list(paging.order(df)) == list(range(len(df)))
+
+
+def test_search_is_case_insensitive_across_columns():
+    df = _frame()
+    assert list(paging.search(df, "ДА")) == [0, 3, 5]
+    assert list(paging.search(df, "A")) == [1, 4]
+    # числовые колонки не участвуют в поиске
+    assert list(paging.search(df, "5")) == []
+    assert list(paging.search(df, "")) == list(range(len(df)))
+
+
+def test_order_sorts_only_found_rows():
+    df = _frame()
+    assert list(paging.order(df, "time", descending=True, text="да")) == [0, 3, 5]
+    assert list(paging.order(df, "n", descending=True, text="да")) == [5, 3, 0]
@@ -0,0 +1,57 @@
+import pytest
+
+from study.source import StudySource
+from study.synth import study_book
+
+from helpers import broken, fresh_pipeline, same_pipeline, tail
+
+
+def test_failed_update_recovers_from_frame(monkeypatch):
+    book = study_book(30, seed=1)
+    source = StudySource(lambda: book)
+    source.refresh()
+    pipe = fresh_pipeline(source)
+    sheet = source.sheets["stage1"]
+
+    book.sheet1.append_rows(tail(1, "late"))
+    assert source.refresh()
+    with monkeypatch.context() as m:
+        m.setattr(pipe.first, "update", broken)
+        with pytest.raises(OSError):
+            pipe.update(sheet)
+    assert pipe.stale
+
+    # время правки то же: лист не опрашивается, в delta — уже наполовину учтённая дельта
+    assert not source.refresh()
+    pipe.update(sheet)
+    assert not pipe.stale
+    assert "late" in pipe.done.completed
+    same_pipeline(pipe, fresh_pipeline(source))
+
+
+def test_incremental_updates_match_reset():
+    book = study_book(30, seed=2)
+    source = StudySource(lambda: book)
+    source.refresh()
+    pipe = fresh_pipeline(source)
+    for i in range(3):
+        book.sheet1.append_rows(tail(10 + i, f"u{i}"))
+        source.refresh()
+        pipe.update(source.sheets["stage1"])
+    same_pipeline(pipe, fresh_pipeline(source))
+
+
+def test_failed_refresh_checks_sheets_again(monkeypatch):
+    book = study_book(10, seed=3)
+    source = StudySource(lambda: book)
+    source.refresh()
+    book.sheet1.append_rows(tail(3, "x"))
+    ws = book.worksheet("stage2_log")
+    with monkeypatch.context() as m:
+        m.setattr(ws, "get_values", broken)
+        with pytest.raises(OSError):
+            source.refresh()
+    # время правки то же, но незаконченный опрос не считается сверкой
+    calls = ws.calls
+    source.refresh()
+    assert ws.calls == calls + 1
@@ -0,0 +1,69 @@
+import threading
+
+from study.poller import Poller
+
+
+def _fields(version: str) -> dict:
+    return {"version": version, "stage1": None, "stage2": None}
+
+
+class _Fetch:
+    """Выдаёт версии по списку; ``gate`` задерживает выдачу, пока тест его не откроет."""
+
+    def __init__(self, versions: list, gate: threading.Event | None = None):
+        self.versions, self.gate, self.calls = list(versions), gate, 0
+        self.started = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        version = self.versions.pop(0)
+        if isinstance(version, Exception):
+            raise version
+        return None if version is None else _fields(version)
+
+
+def test_concurrent_polls_share_one_fetch():
+    gate = threading.Event()
+    fetch = _Fetch(["v1", "v2"], gate)
+    poller = Poller(fetch, interval=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(poller.poll())) for _ in range(4)]
+    for t in threads:
+        t.start()
+    assert fetch.started.wait(5)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    # остальные дождались первой загрузки и не запускали свою
+    assert fetch.calls == 1
+    assert len(results) == 4 and all(r is results[0] for r in results)
+    assert results[0].version == "v1"
+
+
+def test_same_version_is_not_republished():
+    poller = Poller(_Fetch(["v1", "v1", None, "v2"]), interval=60)
+    first = poller.poll()
+    assert poller.poll() is first
+    assert poller.poll() is first
+    second = poller.poll()
+    assert second is not first and second.version == "v2"
+
+
+def test_error_keeps_snapshot_until_next_success():
+    poller = Poller(_Fetch(["v1", RuntimeError("квота"), "v2"]), interval=60)
+    first = poller.poll()
+    assert poller.poll() is first
+    assert isinstance(poller.error, RuntimeError)
+    assert poller.poll().version == "v2"
+    assert poller.error is None
+
+
+def test_seed_is_shown_before_first_poll():
+    poller = Poller(_Fetch(["v1"]), interval=60)
+    poller.seed(**_fields("v1"))
+    seeded = poller.latest(timeout=0)
+    assert seeded.version == "v1"
+    assert poller.poll() is seeded
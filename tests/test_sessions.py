@@ -0,0 +1,101 @@
+import numpy as np
+
+from study import cube
+from study.completion import CompletionTracker
+from study.sessions import analyze
+from study.sheets import parse_stage1, parse_stage2
+from study.synth import stage1_rows, stage2_rows
+
+ARGS = ("session_id", "Пользователь", "Алгоритм", "image_id", 40)
+
+
+def _frame(rows):
+    return parse_stage1(rows, 0, rows[0])
+
+
+def _split(rows: list[list[str]], user: str, at: int) -> list[list[str]]:
+    # первые at ответов пользователя уходят в отдельную, более раннюю сессию
+    out, seen = [rows[0]], 0
+    for r in rows[1:]:
+        if r[1] == user:
+            seen += 1
+            if seen <= at:
+                r = [*r[:-1], r[-1] + "_a"]
+        out.append(r)
+    return out
+
+
+def _completed_users(fun) -> set[str]:
+    ses = fun.sessions
+    return set(ses.loc[ses["completed"], "Пользователь"].astype(str))
+
+
+def test_completion_matches_tracker():
+    rows = stage1_rows(30, seed=1, dropout=0.4)
+    # у первого пользователя один ответ повторён: 41 ответ в сессии
+    extra = next(r for r in rows[1:] if r[1] == rows[1][1])
+    df = _frame(rows + [list(extra)])
+    fun = analyze(df, *ARGS)
+
+    done = CompletionTracker("Пользователь", 40, cube.STAGE1_DIMS)
+    done.reset(df)
+    ses = fun.sessions
+    assert set(ses.loc[ses["completed"], "Пользователь"].astype(str)) == {str(u) for u in done.completed}
+    over = ses[ses["answers"] > 40]
+    assert len(over) == 1 and not over["completed"].any()
+
+
+def test_sessions_over_required_are_not_dropouts():
+    rows = stage1_rows(10, seed=2, dropout=0.5)
+    extra = next(r for r in rows[1:] if r[1] == rows[1][1])
+    base = analyze(_frame(rows), *ARGS)
+    fun = analyze(_frame(rows + [list(extra)]), *ARGS)
+    abandoned = int((fun.sessions["answers"] < 40).sum())
+    assert int(fun.steps["dropped"].sum()) == abandoned
+    assert int(fun.dropout["dropped"].sum()) == abandoned
+    assert abandoned <= int((~base.sessions["completed"]).sum())
+    np.testing.assert_array_equal(fun.steps["reached"], base.steps["reached"])
+
+
+def test_user_with_two_sessions_counts_as_completed():
+    rows = stage1_rows(12, seed=3, dropout=0.5)
+    df = _frame(rows)
+    counts = df["Пользователь"].value_counts()
+    full, short = str(counts[counts == 40].index[0]), str(counts[counts < 40].index[0])
+    rows = _split(_split(rows, full, 15), short, 5)
+    fun = analyze(_frame(rows), *ARGS)
+
+    done = CompletionTracker("Пользователь", 40, cube.STAGE1_DIMS)
+    done.reset(_frame(rows))
+    assert _completed_users(fun) == {str(u) for u in done.completed}
+    assert full in done.completed
+
+    ses = fun.sessions.assign(user=lambda d: d["Пользователь"].astype(str))
+    for name, first in ((full, 15), (short, 5)):
+        mine = ses[ses["user"] == name].sort_values("start")
+        assert list(mine["answers"]) == [first, int(counts[name]) - first]
+        assert (mine["user_answers"] == counts[name]).all()
+        # первая сессия продолжена, итог — у второй
+        assert list(mine["continued"]) == [True, False]
+        assert not mine["completed"].iloc[0] and not mine["abandoned"].iloc[0]
+    assert ses.loc[ses["user"] == full, "completed"].sum() == 1
+    assert ses.loc[ses["user"] == short, "abandoned"].sum() == 1
+    abandoned = int(ses["abandoned"].sum())
+    assert abandoned == int((counts < 40).sum())
+    assert int(fun.steps["dropped"].sum()) == abandoned
+    assert int(fun.dropout["dropped"].sum()) == abandoned
+
+
+def test_stage2_session_is_the_user():
+    rows = stage2_rows(20, seed=4, dropout=0.4)
+    df = parse_stage2(rows, 0, rows[0])
+    fun = analyze(df, "user", "user", "alg", "group", 15)
+    assert fun.sessions.columns.is_unique and fun.answers.columns.is_unique
+    assert not fun.sessions["continued"].any()
+    np.testing.assert_array_equal(fun.sessions["answers"], fun.sessions["user_answers"])
+
+    done = CompletionTracker("user", 15, cube.STAGE2_DIMS)
+    done.reset(df)
+    ses = fun.sessions
+    assert set(ses.loc[ses["completed"], "user"].astype(str)) == {str(u) for u in done.completed}
+    assert int(ses["abandoned"].sum()) == len(ses) - len(done.completed)
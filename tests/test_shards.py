@@ -0,0 +1,82 @@
+from study.source import StudySource, shards
+from study.store import SnapshotStore
+from study.synth import study_book
+
+from helpers import fresh_source, same_frame, tail
+
+
+def test_sharded_frame_matches_single_sheet():
+    one, many = study_book(50, seed=1), study_book(50, seed=1, shards=3)
+    a, b = fresh_source(one).sheets["stage1"].frame, fresh_source(many).sheets["stage1"].frame
+    assert b.index.is_unique
+    same_frame(a, b, index=False)
+
+
+def test_only_active_shard_is_polled():
+    book = study_book(50, seed=2, shards=3)
+    source = fresh_source(book)
+    source.refresh()
+    active = book.worksheet("stage1_3")
+    active.append_rows(tail(1, "new"))
+    calls = {ws.title: ws.calls for ws in book.worksheets()}
+    assert source.refresh()
+    sheet = source.sheets["stage1"]
+    assert not sheet.reloaded and len(sheet.delta) == 40
+    assert {t for t, c in calls.items() if book.worksheet(t).calls != c} == {"stage1_3", "stage2_log"}
+
+
+def test_new_shard_becomes_active():
+    book = study_book(50, seed=3, shards=2)
+    source = fresh_source(book)
+    header = book.sheet1.rows[0]
+    book.add_worksheet("stage1_3", [header] + tail(2, "next"))
+    assert source.refresh()
+    sheet = source.sheets["stage1"]
+    assert sheet.titles == ["Sheet1", "stage1_2", "stage1_3"]
+    assert not sheet.reloaded and len(sheet.delta) == 40
+    assert source.version() == fresh_source(book).version()
+
+
+def test_restart_reads_rows_added_to_previous_active_shard(tmp_path):
+    book = study_book(100, seed=4, shards=2)
+    first = StudySource(lambda: book, SnapshotStore(tmp_path))
+    first.refresh()
+
+    # пока приложение стояло, в активный шард дописали строки и завели новый
+    book.worksheet("stage1_2").append_rows(tail(3, "late"))
+    book.add_worksheet("stage1_3", [book.sheet1.rows[0]] + tail(4, "next"))
+
+    second = StudySource(lambda: book, SnapshotStore(tmp_path))
+    second.restore()
+    second.refresh()
+    expected = fresh_source(book)
+    assert len(second.sheets["stage1"].frame) == len(expected.sheets["stage1"].frame)
+    assert second.version() == expected.version()
+
+    # и снимок, сохранённый после этого, тоже полный
+    third = StudySource(lambda: book, SnapshotStore(tmp_path))
+    saved = third.restore()
+    assert len(saved["stage1"]) == len(expected.sheets["stage1"].frame)
+
+
+def test_restart_does_not_reload_sealed_shards(tmp_path):
+    book = study_book(50, seed=5, shards=3)
+    StudySource(lambda: book, SnapshotStore(tmp_path)).refresh()
+    source = StudySource(lambda: book, SnapshotStore(tmp_path))
+    source.restore()
+    calls = {ws.title: ws.calls for ws in book.worksheets()}
+    source.refresh()
+    # закрытые шарды дочитываются по хвосту одним запросом, без полной загрузки
+    assert all(book.worksheet(t).calls == c + 1 for t, c in calls.items())
+    assert not source.sheets["stage1"].reloaded
+
+
+def test_shards_are_ordered_naturally():
+    book = study_book(20, shards=3)
+    names = ["stage1_10", "stage1_9", "stage1_2025-10", "stage1_2025-9", "stage2_log_2", "other"]
+    extra = [type(book.sheet1)(t, [book.sheet1.rows[0]]) for t in names]
+    sheets = book.worksheets() + extra
+    assert [ws.title for ws in shards(sheets, "stage1")] == [
+        "Sheet1", "stage1_2", "stage1_3", "stage1_9", "stage1_10", "stage1_2025-9", "stage1_2025-10",
+    ]
+    assert [ws.title for ws in shards(sheets, "stage2")] == ["stage2_log", "stage2_log_2"]
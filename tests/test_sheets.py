@@ -0,0 +1,75 @@
+from study.sheets import IncrementalSheet, parse_stage1, parse_stage2
+from study.synth import FakeWorksheet, stage1_rows, stage2_rows
+
+from helpers import same_frame, tail
+
+
+def _reread(ws: FakeWorksheet, parse=parse_stage1) -> IncrementalSheet:
+    sheet = IncrementalSheet(FakeWorksheet(ws.title, [list(r) for r in ws.rows]), parse)
+    sheet.refresh()
+    return sheet
+
+
+def test_tail_append_reads_only_new_rows():
+    ws = FakeWorksheet("Sheet1", stage1_rows(20, seed=1))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    before = len(sheet.frame)
+    ws.append_rows(tail(7, "new"))
+
+    calls = ws.calls
+    sheet.refresh()
+    assert ws.calls == calls + 1
+    assert not sheet.reloaded
+    assert len(sheet.delta) == 40
+    assert len(sheet.frame) == before + 40
+    assert sheet.delta.index.min() == before + 1
+
+    fresh = _reread(ws)
+    assert sheet.fingerprint == fresh.fingerprint
+    same_frame(sheet.frame, fresh.frame)
+
+
+def test_unchanged_sheet_has_empty_delta():
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=2))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    version = sheet.fingerprint
+    sheet.refresh()
+    assert not sheet.reloaded
+    assert sheet.delta.empty
+    assert sheet.fingerprint == version
+
+
+def test_deleted_tail_triggers_reload():
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=3))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    del ws.rows[-3:]
+
+    sheet.refresh()
+    assert sheet.reloaded
+    assert len(sheet.frame) == len(ws.rows) - 1
+    assert sheet.fingerprint == _reread(ws).fingerprint
+
+
+def test_edited_last_row_triggers_reload():
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=4))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    ws.rows[-1][7] = "другой ответ"
+
+    sheet.refresh()
+    assert sheet.reloaded
+    assert sheet.frame.loc[len(ws.rows) - 1, "Ответ"] == "другой ответ"
+
+
+def test_periodic_full_reload():
+    ws = FakeWorksheet("stage2_log", stage2_rows(5, seed=5))
+    sheet = IncrementalSheet(ws, parse_stage2, full_every=2)
+    sheet.refresh()
+    reloaded = []
+    for _ in range(3):
+        sheet.refresh()
+        reloaded.append(sheet.reloaded)
+    assert reloaded == [False, False, True]
@@ -0,0 +1,39 @@
+import time
+
+from study.source import StudySource
+from study.synth import study_book
+
+LATENCY = 0.5
+
+
+def _cold(book) -> float:
+    started = time.perf_counter()
+    StudySource(lambda: book).refresh()
+    return time.perf_counter() - started
+
+
+def test_cold_load_waits_for_slowest_sheet_not_sum():
+    book = study_book(20, latency=LATENCY)
+    elapsed = _cold(book)
+    requests = sum(ws.calls for ws in book.worksheets())
+    assert requests == 2
+    # оба листа запрашиваются одновременно: время ближе к max, чем к сумме
+    assert LATENCY <= elapsed < 1.7 * LATENCY
+
+
+def test_sharded_cold_load_fetches_shards_in_parallel():
+    book = study_book(20, latency=LATENCY, shards=4)
+    elapsed = _cold(book)
+    assert all(ws.calls == 1 for ws in book.worksheets())
+    assert LATENCY <= elapsed < 2 * LATENCY < len(book.worksheets()) * LATENCY
+
+
+def test_unchanged_book_skips_sheet_requests():
+    book = study_book(20, latency=0.01)
+    source = StudySource(lambda: book)
+    source.refresh()
+    source.refresh()  # первая сверка запоминает время правки
+    calls = [ws.calls for ws in book.worksheets()]
+    assert not source.refresh()
+    assert [ws.calls for ws in book.worksheets()] == calls
+
@@ -0,0 +1,102 @@
+import pytest
+
+from study.sheets import IncrementalSheet, parse_stage1
+from study.source import StudySource
+from study.store import SnapshotStore
+from study.synth import FakeWorksheet, stage1_rows, study_book
+
+from helpers import broken, same_frame, tail
+
+
+def test_new_rows_are_appended_as_deltas(tmp_path):
+    book = study_book(20, seed=1)
+    source = StudySource(lambda: book, SnapshotStore(tmp_path))
+    source.refresh()
+    base = SnapshotStore(tmp_path).path("stage1")
+    mtime = base.stat().st_mtime_ns
+
+    for i in range(3):
+        book.sheet1.append_rows(tail(i, f"new{i}"))
+        assert source.refresh()
+    assert base.stat().st_mtime_ns == mtime
+    assert len(list(SnapshotStore(tmp_path).deltas("stage1").glob("*.arrow"))) == 3
+
+    frame, watermark = SnapshotStore(tmp_path).load("stage1")
+    sheet = source.sheets["stage1"]
+    same_frame(frame, sheet.frame)
+    assert watermark == sheet.watermark()
+
+
+def test_warm_start_continues_from_deltas(tmp_path):
+    book = study_book(20, seed=2)
+    first = StudySource(lambda: book, SnapshotStore(tmp_path))
+    first.refresh()
+    book.sheet1.append_rows(tail(5, "late"))
+    first.refresh()
+
+    second = StudySource(lambda: book, SnapshotStore(tmp_path))
+    saved = second.restore()
+    assert saved is not None and len(saved["stage1"]) == len(first.sheets["stage1"].frame)
+    calls = book.sheet1.calls
+    assert not second.refresh()
+    assert book.sheet1.calls == calls + 1  # одно дочитывание хвоста, без полной загрузки
+    assert second.version() == first.version()
+
+
+def test_compaction_and_reload_rewrite_one_file(tmp_path):
+    store = SnapshotStore(tmp_path, compact_every=2)
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=3))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    store.save("s", sheet.frame, sheet.watermark())
+    for i in range(3):
+        ws.append_rows(tail(10 + i, f"u{i}"))
+        sheet.refresh()
+        store.append("s", sheet.delta, sheet.frame, sheet.watermark())
+    # две дельты, затем сведение в полный снимок
+    assert not list(store.deltas("s").glob("*.arrow"))
+    frame, watermark = store.load("s")
+    same_frame(frame, sheet.frame)
+    assert watermark == sheet.watermark()
+
+
+def test_stale_deltas_of_previous_base_are_ignored(tmp_path):
+    store = SnapshotStore(tmp_path)
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=4))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    store.save("s", sheet.frame, sheet.watermark())
+    ws.append_rows(tail(1, "x"))
+    sheet.refresh()
+    store.append("s", sheet.delta, sheet.frame, sheet.watermark())
+    stale = sorted(store.deltas("s").glob("*.arrow"))[0].read_bytes()
+
+    sheet._reload()
+    store.save("s", sheet.frame, sheet.watermark())
+    # дельта от прежнего снимка, оставшаяся после сбоя, не применяется
+    store.deltas("s").mkdir()
+    (store.deltas("s") / "000001.arrow").write_bytes(stale)
+    frame, _ = SnapshotStore(tmp_path).load("s")
+    assert len(frame) == len(sheet.frame)
+
+
+def test_failed_delta_forces_full_save(tmp_path, monkeypatch):
+    store = SnapshotStore(tmp_path)
+    ws = FakeWorksheet("Sheet1", stage1_rows(5, seed=5))
+    sheet = IncrementalSheet(ws, parse_stage1)
+    sheet.refresh()
+    store.save("s", sheet.frame, sheet.watermark())
+
+    write = store._write
+    monkeypatch.setattr(store, "_write", broken)
+    ws.append_rows(tail(1, "lost"))
+    sheet.refresh()
+    with pytest.raises(OSError):
+        store.append("s", sheet.delta, sheet.frame, sheet.watermark())
+    monkeypatch.setattr(store, "_write", write)
+
+    ws.append_rows(tail(2, "next"))
+    sheet.refresh()
+    store.append("s", sheet.delta, sheet.frame, sheet.watermark())
+    frame, _ = store.load("s")
+    assert len(frame) == len(sheet.frame)
@@ -0,0 +1,53 @@
+import pytest
+
+from study.pipeline import STAGES, StagePipeline
+from study.source import StudySource
+from study.store import ArtifactStore
+from study.synth import study_book
+from study.worker import step
+
+from helpers import broken, tail
+
+
+def test_failed_write_is_retried_without_reapplying_delta(tmp_path, monkeypatch):
+    book = study_book(20, seed=1)
+    source = StudySource(lambda: book, stages=("stage1",))
+    pipeline = StagePipeline(STAGES["stage1"])
+    artifacts = ArtifactStore(tmp_path)
+    assert step("stage1", source, pipeline, artifacts) is not None
+    source.refresh()  # запоминается время правки
+
+    user = "late"
+    book.sheet1.append_rows(tail(7, user))
+    with monkeypatch.context() as m:
+        m.setattr(artifacts, "write", broken)
+        with pytest.raises(OSError):
+            step("stage1", source, pipeline, artifacts)
+
+    # время правки не сдвинулось: лист не перечитывается, пишется готовый результат
+    version = step("stage1", source, pipeline, artifacts)
+    assert version == source.version() == artifacts.current("stage1")
+    frame = artifacts.read("stage1", version)["frame"]
+    assert (frame["Пользователь"] == user).sum() == 40
+    assert user in pipeline.done.completed
+    assert step("stage1", source, pipeline, artifacts) is None
+
+
+def test_failed_update_is_rebuilt_on_next_step(tmp_path, monkeypatch):
+    book = study_book(20, seed=2)
+    source = StudySource(lambda: book, stages=("stage1",))
+    pipeline = StagePipeline(STAGES["stage1"])
+    artifacts = ArtifactStore(tmp_path)
+    step("stage1", source, pipeline, artifacts)
+    source.refresh()
+
+    book.sheet1.append_rows(tail(8, "late"))
+    with monkeypatch.context() as m:
+        m.setattr(pipeline.done, "update", broken)
+        with pytest.raises(OSError):
+            step("stage1", source, pipeline, artifacts)
+    assert pipeline.stale
+
+    version = step("stage1", source, pipeline, artifacts)
+    assert version == source.version()
+    assert "late" in pipeline.done.completed